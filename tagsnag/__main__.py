@@ -12,13 +12,32 @@
 import os
 import sys
 from argparse import ArgumentParser
+from argparse import ArgumentTypeError
 from tagsnag.tagsnag import Tagsnag
+from tagsnag.git import Git
+from tagsnag.engine import ENGINES
+from tagsnag.engine import THREAD_ENGINE
+from tagsnag.asyncgit import DEFAULT_CONCURRENCY
 
 
 def get_script_path():
     return os.path.dirname(__file__)
 
 
+def positive_int(value):
+    """ argparse type for counts that have to be at least 1 """
+
+    try:
+        number = int(value)
+    except ValueError:
+        raise ArgumentTypeError('{} is not a number'.format(value))
+
+    if number < 1:
+        raise ArgumentTypeError('{} is less than 1'.format(value))
+
+    return number
+
+
 def main():
     try:
         cwd_path = os.getcwd()
@@ -31,6 +50,8 @@ def main():
         # Create argument parser
         ap = ArgumentParser()
 
+        ap.add_argument('command', nargs='?', choices=Tagsnag.COMMANDS, help='status: print branch, tag, dirty flag and ahead / behind origin of every repo. share: move common objects of all repos into one shared pool')
+
         ##
         # Optionals grouped by category
         ap.add_argument('-d', '--destination', default=os.path.join(cwd_path, "Tagsnag"), help='Destination Path')
@@ -39,16 +60,34 @@ def main():
         ap.add_argument('-dir', '--directory', help='Name of the folder you would like to extract')
 
         ap.add_argument('-t', '--tag', help='String the Tag you would like to checkout contains')
+        ap.add_argument('-m', '--mode', default=Git.CHECKOUT_MODE, choices=Git.EXTRACTION_MODES, help='Extraction mode: checkout the tag, read straight from its object tree, sparse: checkout only the extracted directory (file extraction checks out in full), or worktree: checkout into a temporary worktree, leaving the repo untouched')
 
         ap.add_argument('-x', '--xml', help='Provide an xml config file')
+        ap.add_argument('--partial', default=False, action='store_true', help='Clone missing XML repos without blobs, they are downloaded on checkout')
+        ap.add_argument('--shallow', type=int, metavar='DEPTH', help='Clone missing XML repos with DEPTH commits of master and of every tag')
+        ap.add_argument('--pool', metavar='PATH', help='Object pool shared by all repos (default: ./{})'.format(Git.DEFAULT_POOL_NAME))
+
+        ap.add_argument('--depth', type=int, default=1, help='How many directory levels to search for repositories')
+        ap.add_argument('--exclude', action='append', default=[], help='Skip directories matching this glob (repeatable)')
+
+        ap.add_argument('--engine', default=THREAD_ENGINE, choices=ENGINES, help='Run bulk work on threads or on worker processes')
+        ap.add_argument('-w', '--workers', type=positive_int, help='Number of worker threads / processes (default: CPU count)')
+        ap.add_argument('--max-tasks-per-child', type=positive_int, default=25, help='Recycle a worker process after this many repos')
+        ap.add_argument('--fetch-jobs', type=int, default=DEFAULT_CONCURRENCY, help='Number of concurrent fetch / pull / clone processes (default: {})'.format(DEFAULT_CONCURRENCY))
+        ap.add_argument('--max-open-files', type=int, help='Upper bound for file descriptors held by concurrent git processes')
 
 
         ##
         # Flags
+        ap.add_argument('-n', '--no-cache', default=False, action='store_true', help='Extract again even if the tag still points to the previously extracted commit')
+        ap.add_argument('-D', '--dedup', default=False, action='store_true', help='Store identical files once and hardlink them into the destination')
+        ap.add_argument('-i', '--incremental', default=False, action='store_true', help='Only re-extract repos whose tag moved, which failed last time or whose output changed')
+        ap.add_argument('-j', '--json', default=False, action='store_true', help='Print status as JSON lines')
         ap.add_argument('-l', '--log', default=False, action='store_true', help='Create Logfile')
         ap.add_argument('-p', '--prune', default=False, action='store_true', help='Prune on pull')
         ap.add_argument('-s', '--autostash', default=False, action='store_true', help='Enable autostash before checking out dirty directory')
         ap.add_argument('-u', '--update', default=False, action='store_true', help='Pull from origin/master into master prior to checkout')
+        ap.add_argument('--update-mode', default=Git.PULL_UPDATE, choices=Git.UPDATE_MODES, help='Pull: checkout master and pull. Fetch: one fetch, fast-forward master without checkout')
         ap.add_argument('-v', '--verbose', default=False, action='store_true', help='Increase verbosity')
 
         ##
@@ -57,19 +96,36 @@ def main():
 
         ##
         # Bind options
+        command     = options.command
         destination = options.destination
         extension   = options.extension
         filename    = options.filename
         directory   = options.directory
         tag         = options.tag
         xml_path    = options.xml
+        mode        = options.mode
+        update_mode = options.update_mode
+        clone_depth = options.shallow
+        pool_path   = options.pool
+        engine      = options.engine
+        workers     = options.workers
+        max_tasks_per_child = options.max_tasks_per_child
+        fetch_jobs  = options.fetch_jobs
+        depth       = options.depth
+        excludes    = options.exclude
+        max_open_files = options.max_open_files
 
         # Flags
         should_autostash      = options.autostash
         should_create_logfile = options.log
+        should_use_cache      = not options.no_cache
+        should_run_incremental = options.incremental
+        should_dedup          = options.dedup
         should_prune          = options.prune
         should_update         = options.update
+        should_clone_partial  = options.partial
         verbose               = options.verbose
+        as_json               = options.json
 
         ##
         #  Configuring tagsnag using the provided arguments
@@ -77,6 +133,19 @@ def main():
         tagsnag.set_should_autostash(should_autostash)
         tagsnag.set_should_prune(should_prune)
         tagsnag.set_create_logfile(should_create_logfile)
+        tagsnag.set_extraction_mode(mode)
+        tagsnag.set_update_mode(update_mode)
+        tagsnag.set_clone_options(should_clone_partial, clone_depth)
+        tagsnag.set_object_pool_path(pool_path)
+        tagsnag.set_should_use_cache(should_use_cache)
+        tagsnag.set_should_run_incremental(should_run_incremental)
+        tagsnag.set_should_dedup(should_dedup)
+        tagsnag.set_engine(engine, max_tasks_per_child)
+        tagsnag.set_fetch_jobs(fetch_jobs, max_open_files)
+        tagsnag.set_discovery(depth, excludes)
+
+        if workers:
+            tagsnag.set_workers(workers)
 
         if not should_use_gui:
             tagsnag.run_from_cli(should_update=should_update,
@@ -85,7 +154,9 @@ def main():
                                   directory=directory,
                                   destination=destination,
                                   filename=filename,
-                                  extension=extension)
+                                  extension=extension,
+                                  command=command,
+                                  as_json=as_json)
 
 
     except KeyboardInterrupt:
@@ -0,0 +1,94 @@
+##
+#  archive.py
+#  tagsnag
+#
+#  Created by Thomas Johannesmeyer (thomas@geeky.gent) on 18.10.2026.
+#  Copyright (c) 2026 www.geeky.gent. All rights reserved.
+#
+
+import os
+import stat
+import time
+import tarfile
+import zipfile
+import threading
+from shutil import copyfileobj
+
+
+class ArchiveWriter():
+    """ Streams extracted files into a single tar or zip archive. Entries are
+        copied in chunks, memory use does not depend on the file sizes. The
+        archive is shared between worker threads, one entry is written at a time """
+
+    TAR_MODES = {'.tar': 'w', '.tar.gz': 'w:gz', '.tgz': 'w:gz', '.tar.bz2': 'w:bz2', '.tar.xz': 'w:xz'}
+    ZIP_SUFFIX = '.zip'
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        self.archive = None
+        self.lock = threading.Lock()
+
+
+    @classmethod
+    def is_archive_path(cls, path):
+        """ Returns True if path names a supported archive """
+
+        path = path.lower()
+        return path.endswith(cls.ZIP_SUFFIX) or any(path.endswith(suffix) for suffix in cls.TAR_MODES)
+
+
+    def open(self):
+        if not os.path.exists(os.path.dirname(self.path)):
+            os.makedirs(os.path.dirname(self.path))
+
+        if self.path.lower().endswith(ArchiveWriter.ZIP_SUFFIX):
+            self.archive = zipfile.ZipFile(self.path, 'w', compression=zipfile.ZIP_DEFLATED)
+        else:
+            mode = next(mode for suffix, mode in ArchiveWriter.TAR_MODES.items() if self.path.lower().endswith(suffix))
+            self.archive = tarfile.open(self.path, mode)
+
+
+    def close(self):
+        with self.lock:
+            if self.archive:
+                self.archive.close()
+                self.archive = None
+
+
+    def name_for(self, destination):
+        """ Maps a destination path below the archive path to its entry name """
+
+        return os.path.relpath(os.path.abspath(destination), self.path).replace(os.sep, '/')
+
+
+    def add_stream(self, name, size, stream, executable=False):
+        """ Adds an entry of size bytes read from stream """
+
+        mode = 0o755 if executable else 0o644
+
+        with self.lock:
+            if isinstance(self.archive, zipfile.ZipFile):
+                info = zipfile.ZipInfo(name, date_time=time.localtime()[:6])
+                info.compress_type = zipfile.ZIP_DEFLATED
+                info.external_attr = (stat.S_IFREG | mode) << 16
+
+                with self.archive.open(info, 'w', force_zip64=True) as fh:
+                    copyfileobj(stream, fh)
+
+            else:
+                info = tarfile.TarInfo(name)
+                info.size = size
+                info.mode = mode
+                info.mtime = time.time()
+
+                self.archive.addfile(info, stream)
+
+
+    def add_file(self, path, name):
+        """ Adds the file at path as entry name """
+
+        with open(path, 'rb') as fh:
+            self.add_stream(name = name,
+                            size = os.path.getsize(path),
+                            stream = fh,
+                            executable = bool(os.stat(path).st_mode & stat.S_IXUSR))
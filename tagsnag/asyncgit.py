@@ -0,0 +1,140 @@
+##
+#  asyncgit.py
+#  tagsnag
+#
+#  Created by Thomas Johannesmeyer (thomas@geeky.gent) on 18.10.2026.
+#  Copyright (c) 2026 www.geeky.gent. All rights reserved.
+#
+
+import os
+import re
+import asyncio
+
+try:
+    import resource
+except ImportError:
+    # Windows
+    resource = None
+
+
+##
+# Network-bound git commands (fetch, pull, clone) spend their time waiting on
+# the remote, not on a CPU. Their concurrency is therefore limited separately
+# from the CPU count.
+DEFAULT_CONCURRENCY = 16
+
+# stdout and stderr pipe of each child, plus one for the transient stdin redirection
+FDS_PER_PROCESS = 3
+
+# Descriptors kept free for everything else the process has open
+RESERVED_FDS = 64
+
+progress_separator = re.compile(r'[\r\n]')
+
+
+def available_fds():
+    """ Returns how many file descriptors this process may open in addition """
+
+    if resource:
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+
+        if soft != resource.RLIM_INFINITY:
+            return max(FDS_PER_PROCESS, soft - RESERVED_FDS)
+
+    return 512
+
+
+class AsyncGitRunner():
+    """ Drives git commands for many repositories as asyncio subprocesses.
+        Commands of one repository run in order, repositories run concurrently """
+
+    def __init__(self, concurrency=DEFAULT_CONCURRENCY, max_open_files=None, progress=None):
+        max_open_files = max_open_files or available_fds()
+
+        self.concurrency = max(1, min(concurrency, max_open_files // FDS_PER_PROCESS))
+        self.progress = progress
+
+
+    def run(self, commands):
+        """ commands maps key -> (cwd, [argv, argv, ...]). Returns
+            key -> (returncode, output) of the last command that ran """
+
+        return asyncio.run(self.run_all(commands))
+
+
+    async def run_all(self, commands):
+        semaphore = asyncio.Semaphore(self.concurrency)
+        keys = list(commands)
+
+        results = await asyncio.gather(*[self.run_sequence(semaphore, key, *commands[key]) for key in keys])
+
+        return dict(zip(keys, results))
+
+
+    async def run_sequence(self, semaphore, key, cwd, argvs):
+        result = (0, '')
+
+        async with semaphore:
+            for argv in argvs:
+                result = await self.run_command(key, cwd, argv)
+
+                if result[0] != 0:
+                    break
+
+        return result
+
+
+    async def run_command(self, key, cwd, argv):
+        env = dict(os.environ)
+
+        # Never block on a credential prompt nobody can see
+        env['GIT_TERMINAL_PROMPT'] = '0'
+
+        process = await asyncio.create_subprocess_exec(*argv,
+                                                       cwd=cwd,
+                                                       env=env,
+                                                       stdin=asyncio.subprocess.DEVNULL,
+                                                       stdout=asyncio.subprocess.PIPE,
+                                                       stderr=asyncio.subprocess.PIPE)
+
+        stdout_task = asyncio.ensure_future(process.stdout.read())
+        output = await self.read_progress(key, process.stderr)
+        stdout = await stdout_task
+
+        returncode = await process.wait()
+
+        return returncode, (stdout.decode('utf-8', 'replace') + output).strip()
+
+
+    async def read_progress(self, key, stream):
+        """ Streams stderr to the progress callback line by line. Git rewrites
+            progress lines with '\\r', so both separators end a line """
+
+        buffer = ''
+        lines = []
+
+        while True:
+            chunk = await stream.read(4096)
+
+            if not chunk:
+                break
+
+            buffer += chunk.decode('utf-8', 'replace')
+            parts = progress_separator.split(buffer)
+            buffer = parts.pop()
+
+            for line in parts:
+                if line:
+                    lines.append(line)
+
+                    if self.progress:
+                        self.progress(key, line)
+
+        if buffer:
+            lines.append(buffer)
+
+            if self.progress:
+                self.progress(key, buffer)
+
+        # Progress noise is not worth keeping, the final lines carry errors and summaries
+        return '\n'.join(lines[-20:])
@@ -0,0 +1,105 @@
+##
+#  cache.py
+#  tagsnag
+#
+#  Created by Thomas Johannesmeyer (thomas@geeky.gent) on 18.10.2026.
+#  Copyright (c) 2026 www.geeky.gent. All rights reserved.
+#
+
+import os
+import json
+import tempfile
+import threading
+
+
+class ExtractionCache():
+    """ On-disk record of previous extractions. Each entry is keyed by
+        (repository, tag pattern, file pattern, destination) and remembers
+        the commit the tag resolved to and the files that were written """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = None
+        self.updates = {}
+        self.lock = threading.Lock()
+
+
+    def key(self, repo_path, tag, pattern, destination):
+        """ Returns the cache key for one extraction job """
+
+        return '\0'.join([repo_path, tag, pattern, os.path.abspath(destination)])
+
+
+    def load(self):
+        """ Reads the cache file once. A missing or broken file yields an empty cache """
+
+        if self.entries is not None:
+            return
+
+        try:
+            with open(self.path, 'r') as fh:
+                self.entries = json.load(fh)
+
+        except (IOError, ValueError):
+            self.entries = {}
+
+
+    def lookup(self, key):
+        """ Returns the entry stored for key or None """
+
+        with self.lock:
+            self.load()
+            return self.entries.get(key)
+
+
+    def is_fresh(self, key, commit):
+        """ Returns True if key was extracted from commit and all its outputs still exist """
+
+        entry = self.lookup(key)
+
+        if not entry or entry['commit'] != commit:
+            return False
+
+        return all(os.path.exists(path) for path in entry['outputs'])
+
+
+    def store(self, key, commit, tag, outputs):
+        """ Records an extraction. outputs maps destination path -> {'path', 'blob'} """
+
+        with self.lock:
+            self.load()
+            self.entries[key] = {'commit': commit,
+                                 'tag': tag,
+                                 'outputs': outputs}
+
+            # Entries stored during this run, handed back by worker processes
+            self.updates[key] = self.entries[key]
+
+
+    def merge(self, updates):
+        """ Applies entries stored by another instance, e.g. in a worker process """
+
+        with self.lock:
+            self.load()
+            self.entries.update(updates)
+
+
+    def save(self):
+        """ Writes the cache to disk """
+
+        with self.lock:
+            if self.entries is None:
+                return
+
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+                fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.path))
+                with os.fdopen(fd, 'w') as fh:
+                    json.dump(self.entries, fh)
+
+                os.replace(tmp_path, self.path)
+
+            except (IOError, OSError):
+                # The cache is an optimization only
+                pass
@@ -0,0 +1,204 @@
+##
+#  catfile.py
+#  tagsnag
+#
+#  Created by Thomas Johannesmeyer (thomas@geeky.gent) on 18.10.2026.
+#  Copyright (c) 2026 www.geeky.gent. All rights reserved.
+#
+
+import time
+import threading
+import subprocess
+from contextlib import contextmanager
+from collections import OrderedDict
+
+
+class MissingObjectError(LookupError):
+    """ Raised when an object that has to be read is not in the repository """
+
+
+class CatFile():
+    """ Long-lived `git cat-file --batch-check` / `--batch` processes for one
+        repository. Every lookup is a line on a pipe instead of a new fork.
+        One request is in flight at a time """
+
+    def __init__(self, path):
+        self.path = path
+        self.check_process = None
+        self.batch_process = None
+        self.lock = threading.RLock()
+        self.last_used = time.time()
+
+        # Callers holding this instance, see CatFilePool.checkout. Guarded by the pool's lock
+        self.users = 0
+
+
+    def start(self, option):
+        return subprocess.Popen(['git', 'cat-file', option],
+                                cwd=self.path,
+                                stdin=subprocess.PIPE,
+                                stdout=subprocess.PIPE,
+                                stderr=subprocess.DEVNULL)
+
+
+    def request(self, process, rev):
+        """ Sends rev and returns the parsed header line or None if rev is missing """
+
+        process.stdin.write('{}\n'.format(rev).encode('utf-8'))
+        process.stdin.flush()
+
+        header = process.stdout.readline().decode('utf-8').split()
+
+        if len(header) != 3:
+            # '<rev> missing' / '<rev> ambiguous' / dead process
+            if not header:
+                raise IOError('git cat-file exited in {}'.format(self.path))
+            return None
+
+        sha, type, size = header
+        return sha, type, int(size)
+
+
+    def info(self, rev):
+        """ Returns (sha, type, size) for rev or None """
+
+        with self.lock:
+            self.last_used = time.time()
+
+            if not self.check_process:
+                self.check_process = self.start('--batch-check')
+
+            return self.request(self.check_process, rev)
+
+
+    def read(self, rev):
+        """ Returns (sha, type, data) for rev. Only meant for small objects like trees.
+            Raises MissingObjectError if rev doesn't exist """
+
+        with self.stream(rev) as (sha, type, size, reader):
+            return sha, type, reader.read(size)
+
+
+    @contextmanager
+    def stream(self, rev):
+        """ Yields (sha, type, size, reader) for rev. The content has to be read within
+            the with-block, the remainder is skipped on exit. Raises MissingObjectError
+            if rev doesn't exist """
+
+        with self.lock:
+            self.last_used = time.time()
+
+            if not self.batch_process:
+                self.batch_process = self.start('--batch')
+
+            header = self.request(self.batch_process, rev)
+
+            if header is None:
+                raise MissingObjectError('{} is missing in {}'.format(rev, self.path))
+
+            sha, type, size = header
+            reader = BoundedReader(self.batch_process.stdout, size)
+
+            try:
+                yield sha, type, size, reader
+
+            finally:
+                # Skip what the caller did not read plus the trailing newline
+                while reader.read(1 << 16):
+                    pass
+                self.batch_process.stdout.read(1)
+
+
+    def close(self):
+        with self.lock:
+            for process in (self.check_process, self.batch_process):
+                if process:
+                    process.stdin.close()
+                    process.wait()
+
+            self.check_process = None
+            self.batch_process = None
+
+
+class BoundedReader():
+    """ File-like view on the next size bytes of a stream """
+
+    def __init__(self, stream, size):
+        self.stream = stream
+        self.remaining = size
+
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+
+        data = self.stream.read(size)
+        self.remaining -= len(data)
+
+        return data
+
+
+class CatFilePool():
+    """ One CatFile per repository. Idle instances are evicted after
+        max_idle seconds, beyond max_open the least recently used goes first.
+        Instances are only handed out through checkout, one that is checked
+        out is never evicted """
+
+    def __init__(self, max_open=64, max_idle=60):
+        self.max_open = max_open
+        self.max_idle = max_idle
+        self.cat_files = OrderedDict()
+        self.lock = threading.Lock()
+
+
+    @contextmanager
+    def checkout(self, path):
+        """ Yields the CatFile for the repository at path, it stays open until the with-block ends """
+
+        with self.lock:
+            cat_file = self.cat_files.pop(path, None) or CatFile(path)
+            cat_file.last_used = time.time()
+            cat_file.users += 1
+            self.cat_files[path] = cat_file
+
+            self.evict()
+
+        try:
+            yield cat_file
+
+        finally:
+            with self.lock:
+                cat_file.users -= 1
+                cat_file.last_used = time.time()
+
+
+    def evict_idle(self):
+        """ Closes idle CatFiles, e.g. from a timer while no lookups come in """
+
+        with self.lock:
+            self.evict()
+
+
+    def evict(self):
+        """ Closes idle CatFiles. Has to be called with self.lock held """
+
+        now = time.time()
+
+        for path, cat_file in list(self.cat_files.items()):
+            is_idle = (now - cat_file.last_used > self.max_idle)
+            is_surplus = (len(self.cat_files) > self.max_open)
+
+            if (is_idle or is_surplus) and cat_file.users == 0:
+                del self.cat_files[path]
+                cat_file.close()
+
+
+    def close(self):
+        with self.lock:
+            for cat_file in self.cat_files.values():
+                cat_file.close()
+
+            self.cat_files.clear()
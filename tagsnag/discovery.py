@@ -0,0 +1,153 @@
+##
+#  discovery.py
+#  tagsnag
+#
+#  Created by Thomas Johannesmeyer (thomas@geeky.gent) on 18.10.2026.
+#  Copyright (c) 2026 www.geeky.gent. All rights reserved.
+#
+
+import os
+import json
+import fnmatch
+import tempfile
+import threading
+
+
+DEFAULT_EXCLUDES = ['.tagsnag']
+
+
+def is_repo_root(path):
+    """ Returns True if path carries a .git marker (directory, or file for worktrees and submodules) """
+
+    return os.path.exists(os.path.join(path, '.git'))
+
+
+class RepoRegistry():
+    """ Finds repositories below a root directory by their .git marker, down to
+        max_depth levels and skipping excluded names. Every scanned directory is
+        recorded with its mtime. The next discovery only rescans directories whose
+        mtime changed, i.e. which gained, lost or renamed entries """
+
+    def __init__(self, path):
+        self.path = path
+        self.roots = None
+        self.lock = threading.Lock()
+
+
+    def discover(self, root, max_depth=1, excludes=DEFAULT_EXCLUDES):
+        """ Returns the sorted paths of all repositories below root """
+
+        root = os.path.abspath(root)
+
+        with self.lock:
+            self.load()
+
+            previous = self.roots.get(root, {})
+
+            if previous.get('max_depth') != max_depth or previous.get('excludes') != list(excludes):
+                previous = {}
+
+            old_dirs = previous.get('dirs', {})
+            new_dirs = {}
+
+            repos = self.scan(root, root, 0, max_depth, excludes, old_dirs, new_dirs)
+
+            self.roots[root] = {'max_depth': max_depth,
+                                'excludes': list(excludes),
+                                'dirs': new_dirs}
+
+            if new_dirs != old_dirs:
+                self.save()
+
+        return sorted(repos)
+
+
+    def scan(self, root, dirpath, depth, max_depth, excludes, old_dirs, new_dirs):
+        try:
+            mtime = os.stat(dirpath).st_mtime_ns
+        except OSError:
+            return []
+
+        entry = old_dirs.get(dirpath)
+
+        # Unchanged directories keep their recorded children, as long as no repo lost its marker
+        if not entry or entry['mtime'] != mtime or not all(is_repo_root(repo) for repo in entry['repos']):
+            if depth > 0 and is_repo_root(dirpath):
+                # Was recorded as plain directory but has been turned into a repository
+                return [dirpath]
+
+            entry = self.scan_entries(root, dirpath, depth, max_depth, excludes)
+            entry['mtime'] = mtime
+
+        new_dirs[dirpath] = entry
+        repos = list(entry['repos'])
+
+        for subdir in entry['subdirs']:
+            repos += self.scan(root, subdir, depth + 1, max_depth, excludes, old_dirs, new_dirs)
+
+        return repos
+
+
+    def scan_entries(self, root, dirpath, depth, max_depth, excludes):
+        """ Lists the repositories and plain subdirectories directly below dirpath """
+
+        repos = []
+        subdirs = []
+
+        try:
+            with os.scandir(dirpath) as entries:
+                for dir_entry in entries:
+                    if not dir_entry.is_dir(follow_symlinks=False) or dir_entry.name == '.git':
+                        continue
+
+                    if self.is_excluded(root, dir_entry.path, excludes):
+                        continue
+
+                    if is_repo_root(dir_entry.path):
+                        repos.append(dir_entry.path)
+
+                    elif depth + 1 < max_depth:
+                        subdirs.append(dir_entry.path)
+
+        except OSError:
+            pass
+
+        return {'repos': sorted(repos), 'subdirs': sorted(subdirs)}
+
+
+    def is_excluded(self, root, path, excludes):
+        """ Globs match the directory name or its path relative to root """
+
+        name = os.path.basename(path)
+        relpath = os.path.relpath(path, root).replace(os.sep, '/')
+
+        return any(fnmatch.fnmatch(name, glob) or fnmatch.fnmatch(relpath, glob) for glob in excludes)
+
+
+    def load(self):
+        """ Reads the registry once. A missing or broken file yields an empty registry """
+
+        if self.roots is not None:
+            return
+
+        try:
+            with open(self.path, 'r') as fh:
+                self.roots = json.load(fh)
+
+        except (IOError, ValueError):
+            self.roots = {}
+
+
+    def save(self):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.path))
+            with os.fdopen(fd, 'w') as fh:
+                json.dump(self.roots, fh)
+
+            os.replace(tmp_path, self.path)
+
+        except (IOError, OSError):
+            # The registry is an optimization only
+            pass
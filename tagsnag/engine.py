@@ -0,0 +1,106 @@
+##
+#  engine.py
+#  tagsnag
+#
+#  Created by Thomas Johannesmeyer (thomas@geeky.gent) on 18.10.2026.
+#  Copyright (c) 2026 www.geeky.gent. All rights reserved.
+#
+
+import logging
+import multiprocessing
+from logging.handlers import QueueHandler
+from logging.handlers import QueueListener
+
+
+##
+# Execution engines. Threads share one Git instance, processes each get their
+# own and send their results back to the parent.
+THREAD_ENGINE  = 'thread'
+PROCESS_ENGINE = 'process'
+
+ENGINES = [THREAD_ENGINE, PROCESS_ENGINE]
+
+
+##
+# Worker process side. Everything below runs in the pool's worker processes,
+# therefore it has to live on module level to be picklable.
+
+worker_git = None
+
+
+def init_worker(cwd, settings, log_queue, manifest_job):
+    """ Sets up a worker process: logging through the parent and a private Git instance """
+
+    global worker_git
+
+    # Handlers inherited through fork would write to the terminal / logfile
+    # concurrently with the parent. Route everything through the queue instead.
+    for logger in (logging.getLogger(), logging.getLogger('logger')):
+        for handler in list(logger.handlers):
+            logger.removeHandler(handler)
+
+    logging.getLogger().addHandler(QueueHandler(log_queue))
+
+    from .git import Git
+
+    worker_git = Git(cwd)
+    worker_git.apply_settings(settings)
+
+    if manifest_job:
+        worker_git.manifest.begin(**manifest_job)
+
+
+def run_job(job):
+    """ Runs one Git method against one repository and returns what it recorded """
+
+    method_name, identity, args = job
+
+    worker_git.status_map = {}
+    worker_git.manifest.records = {}
+    worker_git.extraction_cache.updates = {}
+
+    try:
+        getattr(worker_git, method_name)(identity, *args)
+
+    except Exception as exception:
+        worker_git.record_job_failure(identity, method_name, exception, manifest_job=worker_git.manifest.job)
+
+    return {'identity': identity,
+            'status': any(worker_git.status_map.values()),
+            'manifest': worker_git.manifest.records,
+            'cache': worker_git.extraction_cache.updates}
+
+
+class ProcessEngine():
+    """ Shards repositories across worker processes. Workers are replaced after
+        max_tasks_per_child jobs, which contains GitPython's memory growth """
+
+    def __init__(self, git, workers, max_tasks_per_child):
+        self.git = git
+        self.workers = workers
+        self.max_tasks_per_child = max_tasks_per_child
+
+
+    def run(self, method_name, identities, args, manifest_job=None):
+        """ Yields one result dict per repository as soon as it is done """
+
+        log_queue = multiprocessing.Queue()
+
+        # Hand worker records to the handlers of the parent
+        handlers = logging.getLogger().handlers + logging.getLogger('logger').handlers
+        listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+        listener.start()
+
+        jobs = [(method_name, identity, args) for identity in identities]
+
+        try:
+            with multiprocessing.Pool(processes=self.workers,
+                                      maxtasksperchild=self.max_tasks_per_child,
+                                      initializer=init_worker,
+                                      initargs=(self.git.cwd, self.git.settings(), log_queue, manifest_job)) as pool:
+
+                for result in pool.imap_unordered(run_job, jobs):
+                    yield result
+
+        finally:
+            listener.stop()
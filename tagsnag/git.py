@@ -7,13 +7,56 @@
 #
 
 from .snag import Snag
+from .planner import plan_snags
+from .planner import regroup_by_resolved_tag
+from .tree import Tree
+from .tree import TreeEntry
+from .tree import is_ignored_dir
+from .tree import file_matches
+from .tree import directory_matches
+from .treeindex import TreeIndex
+from .cache import ExtractionCache
+from .manifest import Manifest
+from .store import ObjectStore
+from .store import file_writer
+from .store import replace_file
+from .archive import ArchiveWriter
+from .catfile import CatFilePool
+from .repopool import RepoPool
+from .refs import TagIndex
+from .identity import RepoIdentity
+from .status import read_status
+from .status import read_dirty_reasons
+from .status import parse_branch_headers
+from .refs import refs_stamp
+from .refs import read_head_branch
+from .refs import natural_key
+from .metadata import MetadataCache
+from .metadata import metadata_stamp
+from .engine import ProcessEngine
+from .engine import THREAD_ENGINE
+from .engine import PROCESS_ENGINE
+from .asyncgit import AsyncGitRunner
+from .asyncgit import DEFAULT_CONCURRENCY
+from .progress import ProgressAggregator
+from .progress import format_bytes
+from .objectpool import ObjectPool
+from .objectpool import objects_size
+from .discovery import RepoRegistry
+from .discovery import DEFAULT_EXCLUDES
+from .discovery import is_repo_root
 
 import os
-from shutil import copyfile
-from distutils.dir_util import copy_tree
+import stat
+from shutil import copyfileobj
+from shutil import rmtree
 import logging
 import subprocess
+import tempfile
+import threading
+from collections import OrderedDict
 from concurrent.futures.thread import ThreadPoolExecutor
+from concurrent.futures import as_completed
 
 from git import Git
 from git import Repo
@@ -26,34 +69,55 @@ from xml.etree import ElementTree as ET
 class Git():
     """This class handles file-system / Git related tasks"""
 
+    ##
+    # Extraction modes. Checkout moves HEAD of the live worktree to the tag,
+    # tree reads the tag's objects directly and leaves worktree and index alone.
+    # Sparse checks out the tag like checkout, but limits the worktree to the
+    # extracted directory while doing so (directory extraction only). Worktree
+    # checks out into a temporary worktree per job, the main one stays untouched.
+    CHECKOUT_MODE = 'checkout'
+    TREE_MODE     = 'tree'
+    SPARSE_MODE   = 'sparse'
+    WORKTREE_MODE = 'worktree'
+
+    EXTRACTION_MODES = [CHECKOUT_MODE, TREE_MODE, SPARSE_MODE, WORKTREE_MODE]
+
+    # Config touched by 'git sparse-checkout', restored after sparse extraction
+    SPARSE_CONFIG_KEYS = ['extensions.worktreeConfig', 'core.sparseCheckout', 'core.sparseCheckoutCone', 'index.sparse']
+
+    ##
+    # Update modes. Pull checks out master, then pulls master and tags in two
+    # round trips. Fetch gets both with a single fetch and fast-forwards master,
+    # the worktree is only touched if master is checked out.
+    PULL_UPDATE  = 'pull'
+    FETCH_UPDATE = 'fetch'
+
+    UPDATE_MODES = [PULL_UPDATE, FETCH_UPDATE]
+
+    # Object pool of `share`, next to .tagsnag rather than in it: the state dir holds
+    # rebuildable caches only, the member repos can't do without the pool
+    DEFAULT_POOL_NAME = '.tagsnag-pool.git'
+
     def __init__(self, path, cpu_count=1):
         super(Git, self).__init__()
 
         self.cwd = path
         self.cpu_count = cpu_count
+        self.state_path = os.path.join(self.cwd, '.tagsnag')
         self.initial_setup()
         self.status_map = {}
 
 
     def start_with_xml(self, xml_path):
         self.set_xml_path(xml_path)
-        self.load_repositories(self.xml_path)
-
-        for snag in self.snags:
-
-            self.checkout(self.repositories[snag.repo_name], 'master')
-            self.pull(self.repositories[snag.repo_name])
-            self.checkout(self.repositories[snag.repo_name], snag.tag)
-            #  self.searchFileName(path=snag.local_repo_path, containing_folder=snag.containing_folder, filenames=[snag.filename], extension=snag.extension)
+        self.start()
 
-            found_paths = self.search_files(filename=snag.filename, path=snag.local_repo_path, extension=snag.extension)
-            if len(found_paths) > 0:
-                self.copy_file_to_destination(path = found_paths[0], destination = snag.destination)
 
-
-    def active_branch(self, repo):
+    def active_branch(self, identity):
         """ Return name of active branch or None """
 
+        repo = self.repo(identity)
+
         # Detached state needs to be checked first or repo.active_branch will crash
         if repo.head.is_detached:
             return None
@@ -61,26 +125,59 @@ class Git():
             return "{}".format(repo.active_branch)
 
 
-    def head_state(self, repo):
+    def head_state(self, identity):
         """ Return human readable description of head location """
 
-        active_tag = next((tag for tag in repo.tags if tag.commit == repo.head.commit), None)
+        metadata = self.repo_metadata(identity)
+
+        active_tags = self.tag_index(identity).tags_for_commit(metadata['head_commit'])
+        active_tag = active_tags[0] if active_tags else None
 
         if active_tag:
             return active_tag
 
-        # Detached state needs to be checked first or repo.active_branch will crash
-        if repo.head.is_detached:
-            commit_string = '{}'.format(repo.head.commit)
-            return 'Detached at {}'.format(commit_string[:7])
+        if metadata['detached']:
+            return 'Detached at {}'.format(metadata['head_commit'][:7])
 
-        active_branch = self.active_branch(repo)
+        active_branch = metadata['branch']
 
 
         if active_branch:
             return active_branch
 
 
+    def repo_metadata(self, identity):
+        """ Returns root, name, branch, HEAD, tags, branches and remotes of repo.
+            Served from the metadata cache unless HEAD or a ref moved since """
+
+        # Taken before reading, a ref moving in between invalidates the row right away
+        stamp = metadata_stamp(identity.git_dir, identity.common_dir)
+
+        metadata = self.metadata_cache.get(identity.root, stamp)
+
+        if metadata:
+            # Rows are keyed by path, the name depends on the folder the repo was discovered from
+            metadata['name'] = identity.name
+            return metadata
+
+        repo = self.repo(identity)
+        detached = repo.head.is_detached
+        tag_index = TagIndex.from_refs(identity.common_dir, lambda sha: self.resolve_commit(identity, sha))
+
+        metadata = {'root': identity.root,
+                    'name': identity.name,
+                    'branch': None if detached else self.active_branch(identity),
+                    'detached': detached,
+                    'head_commit': self.resolve_commit(identity, 'HEAD'),
+                    'tags': tag_index.commits_by_tag,
+                    'branches': [branch.name for branch in repo.branches],
+                    'remotes': [remote.name for remote in repo.remotes]}
+
+        self.metadata_cache.put(identity.root, stamp, metadata)
+
+        return metadata
+
+
     def update_all_repos(self):
         """Initiate threaded updates for all repositories in working directory"""
 
@@ -91,72 +188,374 @@ class Git():
 
 
     def update_repos(self, repos):
+        """ Prepares all repos locally, then pulls them concurrently as asyncio subprocesses """
+
+        if self.update_mode == Git.FETCH_UPDATE:
+            return self.fetch_update_repos(repos)
+
+        self.log.info('Initiating repo update on up to {} {} workers.'.format(self.cpu_count, self.engine))
+
+        # Dirty check, stash and checkout are local work, run them on the configured engine
+        self.status_map = {}
+        self.run_jobs('prepare_update', repos, ())
+
+        ready_repos = [identity for identity in repos if self.status_map.get(identity)]
+
+        self.log.info('Pulling {} repos on up to {} connections.'.format(len(ready_repos), self.fetch_jobs))
+
+        self.run_network_commands({identity: self.pull_commands() for identity in ready_repos})
+
+
+    def fetch_update_repos(self, repos):
+        """ Fetches master and tags of all repos with one fetch each, then fast-forwards master locally """
+
+        self.log.info('Fetching master and tags of {} repos on up to {} connections.'.format(len(repos), self.fetch_jobs))
+
+        results = self.run_network_commands({identity: [self.fetch_update_command()] for identity in repos})
+        fetched_repos = [identity for identity in repos if results[identity][0] == 0]
+
+        self.status_map = {}
+        self.run_jobs('fast_forward_master', fetched_repos, ())
+
+        updated = [identity for identity in fetched_repos if self.status_map.get(identity)]
+        self.log.info('Updated {} of {} repos.'.format(len(updated), len(repos)))
+
+
+    def fetch_update_command(self):
+        """ Returns the command fetching origin's master and tags in one round trip """
+
+        prune = ['--prune'] if self.should_prune else []
+
+        return (['git', 'fetch', '--progress'] + prune +
+                ['origin', '+refs/heads/master:refs/remotes/origin/master', 'refs/tags/*:refs/tags/*'])
+
+
+    def fast_forward_master(self, identity):
+        """ Moves master to the fetched origin/master if that is a fast-forward. The ref is
+            updated directly unless master is checked out, then the worktree is merged.
+            Repos whose master is checked out in another (linked) worktree are skipped """
+
+        repo_name = identity.name
+        git = self.repo(identity).git
+
+        self.status_map[identity] = False
+
+        try:
+            after = git.rev_parse('--verify', 'refs/remotes/origin/master^{commit}')
+        except GitCommandError:
+            self.log.info('[{}]: origin has no master. Skipping...'.format(repo_name))
+            return False
+
+        try:
+            before = git.rev_parse('--verify', 'refs/heads/master^{commit}')
+        except GitCommandError:
+            before = None
+
+        if before == after:
+            self.log.info('[{}]: master {} (up to date)'.format(repo_name, after[:7]))
+            self.status_map[identity] = True
+            return True
+
+        if before:
+            try:
+                git.merge_base('--is-ancestor', before, after)
+            except GitCommandError:
+                self.log.info('[{}]: master {} has diverged from origin/master {}. Skipping...'.format(repo_name, before[:7], after[:7]))
+                return False
 
-        self.log.info('Initiating repo update on up to {} threads.'.format(self.cpu_count))
+        master_worktree = self.worktree_of_branch(identity, 'master')
+
+        if master_worktree and master_worktree != os.path.realpath(identity.root):
+            # Moving the ref would leave that worktree looking dirty, and it isn't ours to merge into
+            self.log.info('[{}]: master is checked out in worktree {}. Skipping...'.format(repo_name, master_worktree))
+            return False
+
+        if master_worktree:
+            # Checked out, index and worktree have to follow
+            reasons = self.dirty_reasons(identity, include_untracked=False)
+
+            if reasons and not self.should_autostash:
+                self.log.info('[{}]: Dirty repository detected ({}). Autostash disabled. Skipping...'.format(repo_name, ', '.join(sorted(reasons))))
+                return False
+
+            if reasons:
+                self.log.info('  [{}]: Dirty repository detected ({}). Stashing...'.format(repo_name, ', '.join(sorted(reasons))))
+                self.stash_repo(identity)
+
+            try:
+                git.merge('--ff-only', '--quiet', after)
+            except GitCommandError as exception:
+                self.log.info('[{}]: Fast-forward failed: {}'.format(repo_name, exception.stderr.strip()))
+                return False
+
+            how = 'merged into worktree'
+
+        else:
+            # Refs only. Passing the old value makes the update fail if master moved meanwhile
+            try:
+                git.update_ref('-m', 'tagsnag: fast-forward', 'refs/heads/master', after, before or '0' * 40)
+            except GitCommandError as exception:
+                self.log.info('[{}]: Updating master failed: {}'.format(repo_name, exception.stderr.strip()))
+                return False
+
+            how = 'refs only'
+
+        self.log.info('[{}]: master {} -> {} ({})'.format(repo_name, before[:7] if before else 'none', after[:7], how))
+        self.status_map[identity] = True
+
+        return True
+
+
+    def worktree_of_branch(self, identity, branch):
+        """ Returns the real path of the worktree (main or linked) that has branch checked out, or None """
+
+        porcelain = self.repo(identity).git.worktree('list', '--porcelain')
+        worktree_path = None
+
+        for line in porcelain.splitlines():
+            if line.startswith('worktree '):
+                worktree_path = line[len('worktree '):]
+
+            elif line == 'branch refs/heads/{}'.format(branch):
+                return os.path.realpath(worktree_path)
+
+        return None
+
+
+    def fetch_repos(self, repos, progress=None):
+        """ Fetches origin for all repos concurrently. progress(identity, line) receives git's
+            progress output, e.g. ProgressAggregator.feed """
+
+        self.log.info('Fetching {} repos on up to {} connections.'.format(len(repos), self.fetch_jobs))
+
+        return self.run_network_commands({identity: [self.fetch_command()] for identity in repos}, progress)
+
+
+    def run_network_commands(self, commands_by_repo, progress=None, cwd=None):
+        """ Runs a list of git commands per repo, repos concurrently up to fetch_jobs.
+            Commands run in the repo's root unless cwd is given (e.g. for clones).
+            Returns {identity: (returncode, output)} """
+
+        def log_progress(identity, state):
+            self.log.debug('  [{}]: {}'.format(identity.name, state['message']))
+
+        # Without a consumer, progress is only logged: rate limited per repo, totals at the end
+        aggregator = None if progress else ProgressAggregator(log_progress)
+
+        runner = AsyncGitRunner(concurrency = self.fetch_jobs,
+                                max_open_files = self.max_open_files,
+                                progress = progress or aggregator.feed)
+
+        commands = {identity: (cwd or identity.root, argvs) for identity, argvs in commands_by_repo.items()}
+        results = runner.run(commands)
+
+        if aggregator:
+            aggregator.flush()
+            self.log.info('Received {}.'.format(aggregator.summary()))
+
+        for identity, (returncode, output) in results.items():
+            repo_name = identity.name
+
+            if returncode != 0:
+                self.log.info('  [{}]: Git Command Error (exit code {}):\n{}'.format(repo_name, returncode, output))
+            else:
+                self.log.debug('  [{}]: Done.'.format(repo_name))
+
+        return results
+
+
+    def run_jobs(self, method_name, repos, args, manifest_job=None):
+        """ Runs self.<method_name>(identity, *args) for every repo on the configured engine """
+
+        if self.engine == PROCESS_ENGINE and self.archive:
+            self.log.info('Archive output is written by a single process. Falling back to threads.')
+
+        elif self.engine == PROCESS_ENGINE:
+            engine = ProcessEngine(git = self,
+                                   workers = self.cpu_count,
+                                   max_tasks_per_child = self.max_tasks_per_child)
+
+            for result in engine.run(method_name, list(repos), args, manifest_job):
+                self.status_map[result['identity']] = result['status']
+                self.manifest.merge(result['manifest'])
+                self.extraction_cache.merge(result['cache'])
+
+            return
 
         with ThreadPoolExecutor(max_workers=self.cpu_count) as executor:
-            for repo in self.repos:
-                executor.submit(self.update_repo, repo)
+            futures = {executor.submit(getattr(self, method_name), identity, *args): identity for identity in repos}
 
+            # Reported like the process engine does, an exception must not vanish with its future
+            for future in as_completed(futures):
+                if future.exception():
+                    self.record_job_failure(futures[future], method_name, future.exception(), manifest_job)
 
-    def update_repo(self, repo):
+
+    def record_job_failure(self, identity, method_name, exception, manifest_job=None):
+        """ Logs a job that raised. Extraction jobs get a failed outcome in the manifest """
+
+        self.log.info('[{}]: {} failed: {}'.format(identity.name, method_name, exception))
+
+        if manifest_job:
+            self.record_outcome(identity, None, None, Manifest.FAILED)
+
+        else:
+            self.status_map[identity] = False
+
+
+    def update_repo(self, identity):
         """Update provided repository"""
 
-        repo_path = self.get_root(repo)
-        repo_name = os.path.basename(repo_path)
+        if self.prepare_update(identity):
+            self.pull(identity)
+
+
+    def prepare_update(self, identity):
+        """ Stashes (if enabled) and checks out master. Returns False if the repo has to be skipped """
+
+        repo_name = identity.name
 
         self.log.info('[{}]: Checking status.'.format(repo_name))
 
-        if self.is_dirty(repo):
-            self.log.info('  [{}]: Dirty repository detected.'.format(repo_name))
+        # Untracked files don't block checking out master
+        reasons = self.dirty_reasons(identity, include_untracked=False)
+
+        if reasons:
+            self.log.info('  [{}]: Dirty repository detected ({}).'.format(repo_name, ', '.join(sorted(reasons))))
             if self.should_autostash:
                 self.log.info('    [{}]: Autostash enabled. Stashing...'.format(repo_name))
-                self.stash_repo(repo)
+                self.stash_repo(identity)
 
             else:
                 self.log.info('    [{}]: Autostash disabled. Skipping...'.format(repo_name))
-                return
+                self.status_map[identity] = False
+                return False
         else:
             self.log.debug('  [{}]: Status clean.'.format(repo_name))
 
 
         self.log.info('[{}]: Initiating update...'.format(repo_name))
 
-        self.checkout(repo, 'master')
-        self.pull(repo)
+        self.checkout(identity, 'master')
+        self.status_map[identity] = True
 
+        return True
 
-    def find_tag(self, repo, keyword):
+
+    def find_tag(self, identity, keyword):
         """Attempt to find tag in provided repo. Fallback to fuzzyfind tag"""
 
         found_tag = ""
 
-        # newest tags first — tags are in arbitrary order, therefore 1. sort, 2. reverse
-        #  tags = reversed(sorted(repo.tags, key=lambda t: t.tag.tagged_date))
-        tags = repo.tags
-        repo_name = self.get_repo_name(repo)
+        tag_index = self.tag_index(identity)
+        repo_name = self.get_repo_name(identity)
 
         self.log.info('[{}]: Searching for tag: <{}>'.format(repo_name, keyword))
 
-        self.log.debug('  [{}]: List of tags:{}'.format(repo_name, tags))
+        self.log.debug('  [{}]: List of tags:{}'.format(repo_name, tag_index.names))
 
         # check if keyword corresponds to one tag exactly
-        if keyword in tags:
+        if tag_index.exact(keyword):
             self.log.debug('  [{}]: <{}> matched exactly'.format(repo_name, keyword))
             found_tag = keyword
         else:
             self.log.debug('  [{}]: Couldn\'t find {}. Fuzzy search... '.format(repo_name, keyword))
-            for tag in tags:
-                if keyword in str(tag):
-                    found_tag = tag
-                    self.log.debug('    [{}]: Fuzzy matched {} > <{}>.'.format(repo_name, keyword, found_tag))
+            found_tag = tag_index.find(keyword) or ""
+
+            if found_tag:
+                self.log.debug('    [{}]: Fuzzy matched {} > <{}>.'.format(repo_name, keyword, found_tag))
 
         return found_tag
 
 
+    def tag_index(self, identity):
+        """ Returns the TagIndex of the provided repo. Rebuilt only if a tag ref changed """
+
+        common_dir = identity.common_dir
+        stamp = refs_stamp(common_dir)
+
+        with self.tag_indexes_lock:
+            tag_index = self.tag_indexes.get(common_dir)
+
+        if tag_index and tag_index.stamp == stamp:
+            return tag_index
+
+        tag_index = TagIndex(self.repo_metadata(identity)['tags'], stamp)
+
+        with self.tag_indexes_lock:
+            self.tag_indexes[common_dir] = tag_index
+
+        return tag_index
+
+
     def clone_url_into_path(self, url, path):
-        """ Clones from a url into the provided path """
-        Repo.clone_from(url, path)
+        """ Clones from a url into the provided path. Objects in the shared pool aren't downloaded again """
+
+        if not self.object_pool.exists():
+            Repo.clone_from(url, path)
+            return
+
+        Repo.clone_from(url, path, reference=self.object_pool.path)
+
+        try:
+            self.object_pool.add(self.identity(path))
+        except subprocess.CalledProcessError as exception:
+            self.log.info('[{}]: Adding to object pool failed: {}'.format(os.path.basename(path), exception.stderr.strip()))
+
+
+    def share_objects_all_repos(self):
+        """ Attaches all repositories in working directory to the shared object pool """
+
+        if not self.repos:
+            self.repos = self.collect_repositories(self.cwd)
+
+        self.share_objects(self.repos)
+
+
+    def share_objects(self, repos):
+        """ Copies the objects of all repos into the shared pool, then drops the local copies the pool holds """
+
+        self.log.info('Sharing objects of {} repos through {}.'.format(len(repos), self.object_pool.path))
+        self.log.info('Every shared repo depends on the pool from now on. Keep it, don\'t move or delete it.')
+
+        attached_repos = []
+
+        # One writer at a time into the pool. Fetching from a repo is cheap, mostly the
+        # first one transfers the shared history
+        for identity in repos:
+            try:
+                self.object_pool.add(identity)
+                attached_repos.append(identity)
+
+            except subprocess.CalledProcessError as exception:
+                self.log.info('[{}]: Adding to object pool failed: {}'.format(identity.name, exception.stderr.strip()))
+
+        self.status_map = {}
+        self.run_jobs('repack_against_pool', attached_repos, ())
+
+        self.log.info('Shared objects of {} of {} repos. Pool size: {}.'.format(len([r for r in attached_repos if self.status_map.get(r)]),
+                                                                               len(repos),
+                                                                               format_bytes(objects_size(self.object_pool.path))))
+
+
+    def repack_against_pool(self, identity):
+        """ Repacks repo, leaving out every object its alternates (the pool) already have """
+
+        repo_name = identity.name
+        size_before = objects_size(identity.common_dir)
+
+        try:
+            self.repo(identity).git.repack('-a', '-d', '-l', '-q')
+
+        except GitCommandError as exception:
+            self.log.info('[{}]: Repack failed: {}'.format(repo_name, exception.stderr.strip()))
+            self.status_map[identity] = False
+            return
+
+        self.log.info('[{}]: Objects {} -> {}'.format(repo_name,
+                                                       format_bytes(size_before),
+                                                       format_bytes(objects_size(identity.common_dir))))
+        self.status_map[identity] = True
 
 
     def assign_master_repo(self, master_path, repo_url, remote_name, keep_remote=False):
@@ -192,38 +591,105 @@ class Git():
     def extract_directory_from_repos(self, repos, tag, directory, destination):
         """Initiate threaded directory extraction for all repositories in working directory"""
 
-        self.log.info('Initiating directory extraction on {} threads.'.format(self.cpu_count))
+        self.log.info('Initiating directory extraction on {} {} workers.'.format(self.cpu_count, self.engine))
 
-        with ThreadPoolExecutor(max_workers=self.cpu_count) as executor:
-            for repo in repos:
+        manifest_job = {'kind': 'directory', 'tag': tag, 'pattern': directory, 'destination': destination}
+        self.manifest.begin(**manifest_job)
+        self.open_archive(destination)
+
+        try:
+            for identity in repos:
                 # self.status_map[repo] = 'Extract {} -> {}. Tag: {}'.format(directory, destination, tag)
-                self.status_map[repo] = False
-                executor.submit(self.extract_directory, repo, tag, directory, destination)
+                self.status_map[identity] = False
+
+            self.run_jobs('extract_directory', repos, (tag, directory, destination), manifest_job)
+
+        finally:
+            # Writes the end records, a failed run still leaves a readable archive
+            self.close_archive()
 
+        self.extraction_cache.save()
+        self.manifest.save()
 
-    def extract_directory(self, repo, tag, directory, destination):
+
+    def extract_directory(self, identity, tag, directory, destination):
         """Attempt to extract described directory from provided repo"""
 
-        repo_path = self.get_root(repo)
-        repo_name = os.path.basename(repo_path)
+        repo_name = identity.name
 
-        valid_tag = self.find_tag(repo, tag)
+        valid_tag = self.find_tag(identity, tag)
 
         if valid_tag == '':
             self.log.info('  [{}]: <{}> tag could not be found. Skipping repo'.format(repo_name, tag))
+            self.record_outcome(identity, None, None, Manifest.NO_TAG)
             return
 
         else:
             self.log.info('  [{}]: Valid Tag found: {} -> {}'.format(repo_name, tag, valid_tag))
 
+        commit = self.resolve_commit(identity, valid_tag)
+        cache_key = self.extraction_cache.key(identity.root, tag, 'directory:{}'.format(directory), destination)
+
+        if self.skip_unchanged_extraction(identity, valid_tag, cache_key, commit):
+            return
+
+        repo_destination = os.path.join(destination, *repo_name.split('/'))
+        tree = self.load_tree(identity, commit)
+        outputs = None
+
+        if self.extraction_mode == Git.TREE_MODE:
+            found_entries = tree.search_directory(directory=directory)
+
+            if len(found_entries) > 0:
+                self.log.info('  [{}]: Found Directory {}'.format(repo_name, found_entries[0].path))
+                outputs = self.write_tree_to_destination(identity = identity,
+                                                         tree = tree,
+                                                         path = found_entries[0].path,
+                                                         destination = repo_destination)
+
+        elif self.extraction_mode == Git.SPARSE_MODE:
+            # The tree index knows where the directory is before anything is checked out
+            found_entries = tree.search_directory(directory=directory)
+
+            if len(found_entries) > 0:
+                found_path = found_entries[0].path
+                self.log.info('  [{}]: Found Directory {}'.format(repo_name, found_path))
+
+                sparse_settings = self.sparse_settings(identity)
+
+                try:
+                    self.sparse_checkout(identity, valid_tag, found_path)
+                    self.copy_directory_to_destination(path = os.path.join(identity.root, *found_path.split('/')),
+                                                       destination = repo_destination)
+
+                finally:
+                    self.restore_sparse_settings(identity, sparse_settings)
+
+                outputs = {os.path.join(repo_destination, *relative_path.split('/')): {'path': entry.path, 'blob': entry.sha}
+                           for relative_path, entry in tree.blobs_below(found_path)}
+
+        else:
+            worktree_path = self.checkout_for_extraction(identity, valid_tag, commit)
+
+            try:
+                found_paths = self.search_directory(directory=directory, path=worktree_path)
+
+                if len(found_paths) > 0:
+                    self.copy_directory_to_destination(path = found_paths[0], destination = repo_destination)
 
-        self.checkout(repo, valid_tag)
+                    found_path = os.path.relpath(found_paths[0], worktree_path).replace(os.sep, '/')
+                    outputs = {os.path.join(repo_destination, *relative_path.split('/')): {'path': entry.path, 'blob': entry.sha}
+                               for relative_path, entry in tree.blobs_below(found_path)}
 
-        found_paths = self.search_directory(directory=directory, path=repo_path)
+            finally:
+                self.release_extraction_checkout(identity, worktree_path)
 
-        if len(found_paths) > 0:
-            self.copy_directory_to_destination(path = found_paths[0], destination = os.path.join(destination, repo_name))
-            self.status_map[repo] = True
+        if outputs is None:
+            self.record_outcome(identity, valid_tag, commit, Manifest.NOT_FOUND)
+            return
+
+        self.extraction_cache.store(cache_key, commit, '{}'.format(valid_tag), outputs)
+        self.record_outcome(identity, valid_tag, commit, Manifest.EXTRACTED, outputs)
 
 
     def extract_file_from_all_repos(self, tag, filename, extension, destination):
@@ -242,51 +708,226 @@ class Git():
     def extract_file_from_repos(self,repos, tag, filename, extension, destination):
         """Initiate threaded file extraction for all repositories in working directory"""
 
-        self.log.info('Initiating file extraction on {} threads.'.format(self.cpu_count))
+        self.log.info('Initiating file extraction on {} {} workers.'.format(self.cpu_count, self.engine))
 
-        with ThreadPoolExecutor(max_workers=self.cpu_count) as executor:
-            for repo in repos:
-                executor.submit(self.extract_file, repo, tag, filename, extension, destination)
+        manifest_job = {'kind': 'file', 'tag': tag, 'pattern': '{}:{}'.format(filename, extension), 'destination': destination}
+        self.manifest.begin(**manifest_job)
+        self.open_archive(destination)
+
+        try:
+            for identity in repos:
+                self.status_map[identity] = False
+
+            self.run_jobs('extract_file', repos, (tag, filename, extension, destination), manifest_job)
+
+        finally:
+            # Writes the end records, a failed run still leaves a readable archive
+            self.close_archive()
+
+        self.extraction_cache.save()
+        self.manifest.save()
 
 
-    def extract_file(self, repo, tag, filename, extension, destination):
+    def extract_file(self, identity, tag, filename, extension, destination):
         """Attempt to extract described file from provided repo"""
 
-        repo_path = self.get_root(repo)
-        repo_name = os.path.basename(repo_path)
+        repo_name = identity.name
 
-        valid_tag = self.find_tag(repo, tag)
+        valid_tag = self.find_tag(identity, tag)
         if valid_tag == '':
             self.log.info('  [{}]: <{}> tag could not be found. Skipping repo'.format(repo_name, tag))
+            self.record_outcome(identity, None, None, Manifest.NO_TAG)
             return
         else:
             self.log.info('  [{}]: Valid Tag found: {} -> {}'.format(repo_name, tag, valid_tag))
 
-        self.checkout(repo, valid_tag)
-        found_paths = self.search_files(filename=filename,
-                path=repo_path,
-                extension=extension)
+        commit = self.resolve_commit(identity, valid_tag)
+        cache_key = self.extraction_cache.key(identity.root, tag, 'file:{}:{}'.format(filename, extension), destination)
+
+        if self.skip_unchanged_extraction(identity, valid_tag, cache_key, commit):
+            return
+
+        file_destination = os.path.join(destination, *repo_name.split('/')) + '.' + extension
+        tree = self.load_tree(identity, commit)
+        outputs = None
+
+        if self.extraction_mode == Git.TREE_MODE:
+            found_entries = tree.search_files(filename=filename, extension=extension)
+
+            if len(found_entries) > 0:
+                self.log.info('  [{}]: Found {}'.format(repo_name, found_entries[0].path))
+                self.write_blob_to_destination(identity = identity,
+                                               entry = found_entries[0],
+                                               destination = file_destination)
+
+                outputs = {file_destination: {'path': found_entries[0].path, 'blob': found_entries[0].sha}}
+
+        else:
+            worktree_path = self.checkout_for_extraction(identity, valid_tag, commit)
+
+            try:
+                found_paths = self.search_files(filename=filename,
+                        path=worktree_path,
+                        extension=extension)
+
+                if len(found_paths) > 0:
+                    self.copy_file_to_destination(path = found_paths[0], destination = file_destination)
+
+                    # Untracked files may match as well, those have no blob id
+                    found_path = os.path.relpath(found_paths[0], worktree_path).replace(os.sep, '/')
+                    entry = tree.entry_for_path(found_path)
+                    outputs = {file_destination: {'path': found_path, 'blob': entry.sha if entry else None}}
+
+            finally:
+                self.release_extraction_checkout(identity, worktree_path)
+
+        if outputs is None:
+            self.record_outcome(identity, valid_tag, commit, Manifest.NOT_FOUND)
+            return
+
+        self.extraction_cache.store(cache_key, commit, '{}'.format(valid_tag), outputs)
+        self.record_outcome(identity, valid_tag, commit, Manifest.EXTRACTED, outputs)
+
 
-        if len(found_paths) > 0:
-            self.copy_file_to_destination(path = found_paths[0], destination = os.path.join(destination, repo_name + '.' + extension))
+    def skip_unchanged_extraction(self, identity, valid_tag, cache_key, commit):
+        """ Returns True (and records the outcome) if the job already ran against commit.
+            Incremental runs compare with the previous manifest, including output hashes.
+            Otherwise the extraction cache decides """
+
+        repo_name = self.get_repo_name(identity)
+
+        if self.archive:
+            # The archive is written from scratch on every run, nothing can be skipped
+            return False
+
+        if self.should_run_incremental:
+            if not self.manifest.is_unchanged(identity.root, commit):
+                return False
+
+            outputs = self.manifest.previous_outputs(identity.root)
+
+        elif self.should_use_cache and self.extraction_cache.is_fresh(cache_key, commit):
+            outputs = list(self.extraction_cache.lookup(cache_key)['outputs'])
+
+        else:
+            return False
+
+        self.log.info('  [{}]: Unchanged since last extraction ({}). Skipping repo'.format(repo_name, commit[:7]))
+        self.record_outcome(identity, valid_tag, commit, Manifest.UNCHANGED, outputs)
+
+        return True
+
+
+    def open_archive(self, destination):
+        """ Starts archive output if destination names a .tar / .zip file """
+
+        if ArchiveWriter.is_archive_path(destination):
+            self.log.info('Writing into archive {}'.format(destination))
+            self.archive = ArchiveWriter(destination)
+            self.archive.open()
+
+
+    def close_archive(self):
+        if self.archive:
+            self.archive.close()
+            self.archive = None
+
+
+    def record_outcome(self, identity, tag, commit, outcome, outputs=()):
+        """ Updates status_map and the run manifest for the provided repo """
+
+        self.status_map[identity] = outcome in Manifest.SUCCESSFUL_OUTCOMES
+
+        self.manifest.record(repo_root = identity.root,
+                             repo_name = self.get_repo_name(identity),
+                             tag = '{}'.format(tag) if tag else None,
+                             commit = commit,
+                             outcome = outcome,
+                             outputs = list(outputs))
 
 
     def start(self):
+        """ Runs all snags of the XML. Each repo is updated once, each of its tags resolved
+            and scanned once for all patterns, repos are processed concurrently """
+
         self.load_repositories(self.xml_path)
 
-        for snag in self.snags:
+        plan = plan_snags(self.snags)
 
-            self.checkout(self.repositories[snag.repo_name], 'master')
-            self.pull(self.repositories[snag.repo_name])
-            self.checkout(self.repositories[snag.repo_name], snag.tag)
-            #  self.searchFileName(path=snag.local_repo_path, containing_folder=snag.containing_folder, filenames=[snag.filename], extension=snag.extension)
+        for repo_name in plan:
+            if repo_name not in self.repositories:
+                self.log.info('[{}]: Repository not available. Skipping its snags.'.format(repo_name))
 
-            found_paths = self.search_files(filename=snag.filename,
-                    path=snag.local_repo_path,
-                    extension=snag.extension)
+        repos = [self.repositories[repo_name] for repo_name in plan if repo_name in self.repositories]
 
-            if len(found_paths) > 0:
-                self.copy_file_to_destination(path = found_paths[0], destination = snag.destination)
+        self.update_repos(repos)
+
+        self.log.info('Running {} snags against {} repos on {} {} workers.'.format(len(self.snags), len(repos), self.cpu_count, self.engine))
+
+        self.status_map = {}
+        self.run_jobs('extract_snags', repos, (plan,))
+
+
+    def extract_snags(self, identity, plan):
+        """ Extracts the snags planned for repo, one tag at a time """
+
+        repo_name = identity.name
+
+        # Fuzzy matching runs once per tag as written, snags ending up on the same tag are merged
+        snags_by_tag = regroup_by_resolved_tag(plan[repo_name], lambda tag: self.find_tag(identity, tag))
+
+        for valid_tag, snags in snags_by_tag.items():
+            if valid_tag == '':
+                self.log.info('  [{}]: No tag found for {} snags. Skipping them.'.format(repo_name, len(snags)))
+                continue
+
+            commit = self.resolve_commit(identity, valid_tag)
+            patterns = [(snag.filename, snag.extension) for snag in snags]
+
+            if self.extraction_mode == Git.TREE_MODE:
+                found_entries = self.load_tree(identity, commit).search_patterns(patterns)
+                found_snags = self.log_found_snags(repo_name, valid_tag, snags, found_entries)
+
+                for snag in found_snags:
+                    self.write_blob_to_destination(identity = identity,
+                                                   entry = found_entries[(snag.filename, snag.extension)],
+                                                   destination = snag.destination)
+
+            else:
+                # One checkout serves every snag of the tag. Searched on disk like extract_file,
+                # untracked files of the worktree may match as well
+                worktree_path = self.checkout_for_extraction(identity, valid_tag, commit)
+
+                try:
+                    found_paths = self.search_patterns(patterns, path=worktree_path)
+                    found_snags = self.log_found_snags(repo_name, valid_tag, snags, found_paths)
+
+                    for snag in found_snags:
+                        self.copy_file_to_destination(path = found_paths[(snag.filename, snag.extension)],
+                                                      destination = snag.destination)
+
+                finally:
+                    self.release_extraction_checkout(identity, worktree_path)
+
+            if found_snags:
+                self.status_map[identity] = True
+
+
+    def log_found_snags(self, repo_name, valid_tag, snags, found):
+        """ Returns the snags whose (filename, extension) is a key of found """
+
+        found_snags = [snag for snag in snags if (snag.filename, snag.extension) in found]
+        self.log.info('  [{}]: {}: found {} of {} snags.'.format(repo_name, valid_tag, len(found_snags), len(snags)))
+
+        return found_snags
+
+
+    def close(self):
+        """ Ends the persistent git processes and open handles of this instance """
+
+        self.cat_files.close()
+        self.repo_pool.close()
+        self.metadata_cache.close()
 
 
     def initial_setup(self):
@@ -295,6 +936,29 @@ class Git():
         self.repos = []
         self.repo_names_and_urls = {}
         self.repositories = {}
+        self.cat_files = CatFilePool()
+        self.repo_pool = RepoPool()
+        self.identities = {}
+        self.identities_lock = threading.Lock()
+        self.tag_indexes = {}
+        self.tag_indexes_lock = threading.Lock()
+        self.tree_index = TreeIndex(os.path.join(self.state_path, 'trees'))
+        self.extraction_cache = ExtractionCache(os.path.join(self.state_path, 'extractions.json'))
+        self.manifest = Manifest(os.path.join(self.state_path, 'manifests'))
+        self.metadata_cache = MetadataCache(os.path.join(self.state_path, 'metadata.sqlite'))
+        self.repo_registry = RepoRegistry(os.path.join(self.state_path, 'repos.json'))
+        self.discovery_depth = 1
+        self.discovery_excludes = DEFAULT_EXCLUDES
+        self.object_store = None
+        self.object_pool = ObjectPool(os.path.join(self.cwd, Git.DEFAULT_POOL_NAME))
+        self.archive = None
+
+        self.engine = THREAD_ENGINE
+        self.max_tasks_per_child = 25
+
+        # Network-bound commands are limited separately from the CPU bound workers
+        self.fetch_jobs = DEFAULT_CONCURRENCY
+        self.max_open_files = None
 
         ##
         # Flags
@@ -302,6 +966,13 @@ class Git():
         self.should_autostash = False
         self.verbose = False
         self.should_create_logfile = False
+        self.should_use_cache = True
+        self.should_run_incremental = False
+
+        self.extraction_mode = Git.CHECKOUT_MODE
+        self.update_mode = Git.PULL_UPDATE
+        self.should_clone_partial = False
+        self.clone_depth = None
 
         # Advanced setup
         self.setup_logger()
@@ -351,7 +1022,7 @@ class Git():
 
             # create repo name by converting to norm path, extracting basepath and cutting off before the .git extension
             repo_name = os.path.basename(os.path.normpath(url)).split('.')[0]
-            repo_path = os.path.normpath("{}/{}".format(os.path.dirname(path), repo_name))
+            repo_path = os.path.normpath("{}/{}".format(os.path.dirname(os.path.abspath(path)), repo_name))
             self.repo_names_and_urls[repo_name]=url
             self.log.debug('Repository: {}'.format(url))
 
@@ -385,91 +1056,306 @@ class Git():
     def clone_repository(self, destination, url):
         """ Clones repository from url into root destination folder """
 
-        self.log.info('Cloning from {}\ninto {}'.format(url, destination))
-        self.log.info('--- This feature is not implemented yet ---')
+        return self.clone_repositories({destination: url})
+
+
+    def clone_repositories(self, urls_by_path):
+        """ Clones {path: url} concurrently up to fetch_jobs. Partial and shallow options
+            apply, see set_clone_options. Returns the identities of the cloned repos """
+
+        self.log.info('Cloning {} repos on up to {} connections.'.format(len(urls_by_path), self.fetch_jobs))
+
+        # Built from the paths, nothing is read from disk before the clone exists
+        commands = {}
+
+        for path, url in urls_by_path.items():
+            path = os.path.abspath(path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+            self.log.info('[{}]: Cloning from {}'.format(os.path.basename(path), url))
+            commands[RepoIdentity.from_root(path)] = self.clone_commands(url, path)
+
+        results = self.run_network_commands(commands, cwd=os.path.abspath(self.cwd))
+
+        cloned = [self.identity(identity.root) for identity, (returncode, output) in results.items() if returncode == 0]
+
+        # Partial and shallow repos can't serve all of their objects to the pool
+        if self.object_pool.exists() and not (self.should_clone_partial or self.clone_depth):
+            for identity in cloned:
+                try:
+                    self.object_pool.add(identity)
+                except subprocess.CalledProcessError as exception:
+                    self.log.info('[{}]: Adding to object pool failed: {}'.format(identity.name, exception.stderr.strip()))
 
-        #  Repo.clone_from(url, destination)
+        self.log.info('Cloned {} of {} repos.'.format(len(cloned), len(urls_by_path)))
 
-        #  p = subprocess.Popen(['git', 'clone', url], cwd=destination)
-        #  p.wait()
+        return cloned
 
-        #  ssh_executable = os.path.join('.', 'ssh_executable.sh')
-        #  with Git().custom_environment(GIT_SSH=ssh_executable):
-            #  Repo.clone_from(url, destination)
 
+    def clone_commands(self, url, path):
+        """ Returns the commands cloning url into path """
 
-        # Somehow doesnt work properly?
-        #  git_ssh_identity_file = os.path.expanduser('~/.ssh/github')
-        #  git_ssh_cmd = 'ssh -i {}'.format(git_ssh_identity_file)
-        #  with Git().custom_environment(GIT_SSH_COMMND=git_ssh_cmd):
-            #  Repo.clone_from(url, destination)
+        options = []
 
+        if self.should_clone_partial:
+            # Blobs are fetched on demand, i.e. only for the commits checked out
+            options += ['--filter=blob:none']
 
-    def checkout(self, repo, target):
+        if self.clone_depth:
+            options += ['--depth', '{}'.format(self.clone_depth)]
+
+        if self.object_pool.exists():
+            options += ['--reference-if-able', self.object_pool.path]
+
+        commands = [['git', 'clone', '--progress'] + options + [url, path]]
+
+        if self.clone_depth:
+            # A shallow clone only has master. Snags checkout tags, get their tips as well
+            commands.append(['git', '-C', path, 'fetch', '--progress', '--depth', '{}'.format(self.clone_depth),
+                             'origin', '+refs/tags/*:refs/tags/*'])
+
+        return commands
+
+
+    def checkout(self, identity, target):
         """ Checkout provided target within given repository """
 
-        self.log.debug('Checking out {} in {}'.format(target, self.get_root(repo)))
-        git = repo.git
+        self.log.debug('Checking out {} in {}'.format(target, identity.root))
+        git = self.repo(identity).git
+        git.checkout(target)
+
+
+    def checkout_for_extraction(self, identity, tag, commit):
+        """ Returns the path holding the checked out tag. In worktree mode that is a
+            temporary worktree, otherwise HEAD of the repo itself is moved to the tag """
+
+        if self.extraction_mode != Git.WORKTREE_MODE:
+            self.checkout(identity, tag)
+            return identity.root
+
+        # Below the state dir, on the same filesystem as the object store
+        scratch_path = os.path.join(self.state_path, 'worktrees')
+        os.makedirs(scratch_path, exist_ok=True)
+
+        worktree_path = tempfile.mkdtemp(prefix='{}-'.format(os.path.basename(identity.root)), dir=scratch_path)
+
+        self.log.debug('Adding worktree for {} of {} in {}'.format(tag, identity.root, worktree_path))
+        git = self.repo(identity).git
+        git.worktree('add', '--detach', '--force', '--no-checkout', worktree_path, commit)
+
+        try:
+            # New worktrees inherit the sparse patterns of the main one, extraction needs every file.
+            # `sparse-checkout disable` would write extensions.worktreeConfig into the shared config
+            git.execute(['git', '-C', worktree_path, '-c', 'core.sparseCheckout=false',
+                         'reset', '--hard', '--quiet'])
+
+        except GitCommandError:
+            self.release_extraction_checkout(identity, worktree_path)
+            raise
+
+        return worktree_path
+
+
+    def release_extraction_checkout(self, identity, worktree_path):
+        """ Removes a worktree made by checkout_for_extraction """
+
+        if worktree_path == identity.root:
+            return
+
+        git = self.repo(identity).git
+
+        try:
+            git.worktree('remove', '--force', worktree_path)
+
+        except GitCommandError as exception:
+            # E.g. the worktree never got registered
+            self.log.debug('  [{}]: Removing worktree failed: {}'.format(identity.name, exception))
+            rmtree(worktree_path, ignore_errors=True)
+            git.worktree('prune')
+
+
+    def sparse_checkout(self, identity, target, directory):
+        """ Restricts the worktree to directory (cone mode), then checks out target.
+            Only the files below directory (and top level files) are written """
+
+        self.log.debug('Sparse checkout of {} in {} limited to {}'.format(target, identity.root, directory))
+        git = self.repo(identity).git
+
+        # 'init --cone' before 'set' also works with git versions lacking 'set --cone'
+        git.sparse_checkout('init', '--cone')
+        git.sparse_checkout('set', directory)
         git.checkout(target)
 
 
-    def pull(self, repo):
+    def sparse_settings(self, identity):
+        """ Returns the sparse checkout state of repo, see restore_sparse_settings """
+
+        git = self.repo(identity).git
+
+        # 'sparse-checkout init' enables per-worktree config and writes the core.* keys there,
+        # so both config files are kept as they are
+        settings = {'is_sparse': git.config('--get', '--type=bool', 'core.sparseCheckout', with_exceptions=False) == 'true',
+                    'local': {},
+                    'files': {}}
+
+        for key in Git.SPARSE_CONFIG_KEYS:
+            # Empty if not set
+            settings['local'][key] = git.config('--local', '--get', key, with_exceptions=False) or None
+
+        for path in self.sparse_files(identity):
+            try:
+                with open(path, 'r') as fh:
+                    settings['files'][path] = fh.read()
+            except (IOError, OSError):
+                settings['files'][path] = None
+
+        return settings
+
+
+    def sparse_files(self, identity):
+        """ Returns the per-worktree config and the sparse patterns file of repo """
+
+        return [os.path.join(identity.git_dir, 'config.worktree'),
+                os.path.join(identity.git_dir, 'info', 'sparse-checkout')]
+
+
+    def restore_sparse_settings(self, identity, settings):
+        """ Puts back the state taken by sparse_settings and updates the worktree to match.
+            A repo that wasn't sparse before gets all files of HEAD written again """
+
+        git = self.repo(identity).git
+
+        if not settings['is_sparse']:
+            git.sparse_checkout('disable')
+
+        for path, content in settings['files'].items():
+            if content is None:
+                if os.path.exists(path):
+                    os.remove(path)
+
+            else:
+                with open(path, 'w') as fh:
+                    fh.write(content)
+
+        for key, value in settings['local'].items():
+            if value is None:
+                git.config('--local', '--unset', key, with_exceptions=False)
+            else:
+                git.config('--local', key, value)
+
+        if settings['is_sparse']:
+            git.sparse_checkout('reapply')
+
+
+    def repo(self, identity):
+        """ Returns the calling thread's Repo handle for the provided repo """
+
+        return self.repo_pool.get(identity.root)
+
+
+    def cat_file(self, identity):
+        """ Returns a context manager yielding the persistent cat-file reader of the provided repo """
+
+        return self.cat_files.checkout(identity.root)
+
+
+    def resolve_commit(self, identity, target):
+        """ Returns the commit SHA the provided target (tag, branch, SHA) points to or None """
+
+        with self.cat_file(identity) as cat_file:
+            info = cat_file.info('{}^{{commit}}'.format(target))
+
+        return info[0] if info else None
+
+
+    def load_tree(self, identity, target):
+        """ Returns the recursive tree listing of target without checking it out """
+
+        commit = self.resolve_commit(identity, target)
+        tree = self.tree_index.get(commit)
+
+        if tree:
+            self.log.debug('  [{}]: Tree of {} loaded from index'.format(self.get_repo_name(identity), commit[:7]))
+            return tree
+
+        with self.cat_file(identity) as cat_file:
+            tree = Tree.from_objects(commit, cat_file.read)
+
+        self.tree_index.put(tree)
+
+        return tree
+
+
+    def pull(self, identity):
         """ Pull origin / master for provided repository """
-        repo_name = self.get_repo_name(repo)
+        repo_name = self.get_repo_name(identity)
 
         self.log.debug('  [{}]: Pulling origin/master'.format(repo_name))
-        git = repo.git
+        git = self.repo(identity).git
 
-        if self.should_prune:
-            git.pull('origin', 'master')
-            git.pull('origin', '--tags')
+        for argv in self.pull_commands():
+            git.execute(argv)
 
-        else:
-            git.pull('origin', 'master', '--prune')
-            git.pull('origin', '--tags', '--prune')
 
+    def pull_commands(self):
+        """ Returns the commands pulling origin/master and origin's tags """
 
-    def is_dirty(self, repo):
-        """ Returns True if repository status is dirty """
+        prune = ['--prune'] if self.should_prune else []
 
-        try:
-            diff_results = repo.index.diff(repo.head.commit)
+        return [['git', 'pull', '--progress', 'origin', 'master'] + prune,
+                ['git', 'pull', '--progress', 'origin', '--tags'] + prune]
 
-        except ValueError as exception:
-            diff_results = repo.index.diff(None)
 
-        else:
-            if len(diff_results) == 0:
-                diff_results = repo.index.diff(None)
+    def fetch_command(self):
+        """ Returns the command fetching origin """
+
+        prune = ['--prune'] if self.should_prune else []
+
+        return ['git', 'fetch', '--progress', 'origin'] + prune
+
+
+    def is_dirty(self, identity):
+        """ Returns True if repository status is dirty. Untracked files don't count """
+
+        return len(self.dirty_reasons(identity, include_untracked=False, first_only=True)) > 0
+
 
-        return (len(diff_results) > 0)
+    def dirty_reasons(self, identity, include_untracked=True, first_only=False):
+        """ Returns why the repository is dirty: a subset of {staged, unstaged, untracked} """
 
+        return read_dirty_reasons(identity.root,
+                                  include_untracked = include_untracked,
+                                  first_only = first_only)
 
-    def stash_repo(self, repo):
+
+    def stash_repo(self, identity):
         """ Run stash within provided repository """
 
-        assert repo
-        git = repo.git
+        assert identity
+        git = self.repo(identity).git
         git.stash()
 
 
-    def stash_pop_repo(self, repo):
+    def stash_pop_repo(self, identity):
         """ Run stash within provided repository """
 
-        assert repo.exists()
-        git = repo.git
+        assert os.path.exists(identity.root)
+        git = self.repo(identity).git
         git.stash('pop')
 
 
-    def get_root(self, repo):
-        return repo.git.rev_parse('--show-toplevel')
+    def get_root(self, identity):
+        """ Returns the worktree root of provided repo """
+
+        return identity.root
 
 
-    def fetch(self, repo, progress_printer = None):
+    def fetch(self, identity, progress_printer = None):
         """ Fetch data from origin for provided repo and branch and return fetch info """
 
         fetch_info = None
-        repo_name = self.get_repo_name(repo)
+        repo = self.repo(identity)
+        repo_name = self.get_repo_name(identity)
         self.log.debug('  [{}]: Fetch initiated'.format(repo_name))
         try:
             if progress_printer == None:
@@ -496,11 +1382,11 @@ class Git():
         return fetch_info
 
 
-    def merge(self, repo, source_branch_name, target_branch_name):
-        repo_name = self.get_repo_name(repo)
+    def merge(self, identity, source_branch_name, target_branch_name):
+        repo_name = self.get_repo_name(identity)
         print('{}: Merge {} into {}'.format(repo_name, source_branch_name, target_branch_name))
         try:
-            git = repo.git
+            git = self.repo(identity).git
             git.execute(['git', 'checkout', '{}'.format(target_branch_name)])
             git.execute(['git', 'merge', '{}'.format(source_branch_name), '--ff-only'])
 
@@ -531,48 +1417,129 @@ class Git():
 
 
 
-    def behind_branch(self, repo, remote, branch):
+    def behind_branch(self, identity, remote, branch):
         """ Checks by how many commits <branch> is behind <remote>/<branch> """
 
         # print('[{}]: BEHIND? Branch: {} Remote: {}'.format(self.get_repo_name(repo), branch, remote))
-        return int(repo.git.rev_list('--left-only', '--count', '{}/{}...@'.format(remote, branch)))
+        return int(self.repo(identity).git.rev_list('--left-only', '--count', '{}/{}...@'.format(remote, branch)))
 
 
-    def ahead_branch(self, repo, remote, branch):
+    def ahead_branch(self, identity, remote, branch):
         """ Checks by how many commits <branch> is ahead <remote>/<branch> """
 
         # print('[{}]: AHEAD? Branch: {} Remote: {}'.format(self.get_repo_name(repo), branch, remote))
-        return int(repo.git.rev_list('--right-only', '--count', '{}/{}...@'.format(remote, branch)))
+        return int(self.repo(identity).git.rev_list('--right-only', '--count', '{}/{}...@'.format(remote, branch)))
+
+
+    def status_all_repos(self):
+        """ Returns status snapshots for all repositories in working directory """
+
+        if not self.repos:
+            self.repos = self.collect_repositories(self.cwd)
+
+        return self.status_repos(self.repos)
+
+
+    def status_repos(self, identities):
+        """ Returns one status snapshot per repo, in order. Repos are processed concurrently """
+
+        # Snapshots mostly wait on git processes, more threads than CPUs keep those busy
+        with ThreadPoolExecutor(max_workers=self.cpu_count * 4) as executor:
+            return list(executor.map(self.status_snapshot, identities))
+
+
+    def status_snapshot(self, identity):
+        """ Returns branch, HEAD, exact tag, dirty flag and ahead / behind origin of repo.
+            Costs one `git status` and, unless the tag index is up to date, one `git for-each-ref` """
+
+        config = []
+        branch = read_head_branch(identity.git_dir)
+
+        if branch and not self.has_upstream(identity, branch):
+            # Compare with origin/<branch> for this call only, status counts ahead / behind itself
+            config += ['-c', 'branch.{}.remote=origin'.format(branch),
+                       '-c', 'branch.{}.merge={}'.format(branch, 'refs/heads/' + branch)]
+
+        headers, reasons = read_status(identity.root,
+                                       include_untracked = False,
+                                       first_only = True,
+                                       branch = True,
+                                       config = config)
+
+        head, branch, upstream, ahead, behind = parse_branch_headers(headers)
+
+        tags = self.tags_for_commit(identity, head) if head else []
+
+        return {'repo': identity.name,
+                'path': identity.root,
+                'branch': branch,
+                'detached': head is not None and branch is None,
+                'head': head,
+                'tag': tags[0] if tags else None,
+                'dirty': len(reasons) > 0,
+                'ahead': ahead,
+                'behind': behind}
+
+
+    def has_upstream(self, identity, branch):
+        """ Returns True if branch has an upstream configured. Reads the config files, no git call """
+
+        config = self.repo(identity).config_reader()
+        return config.has_option('branch "{}"'.format(branch), 'merge')
+
+
+    def tags_for_commit(self, identity, commit):
+        """ Returns the tags pointing to commit, highest first. A stale tag index is not
+            rebuilt for this, that would peel every tag. One `for-each-ref` peels as needed """
+
+        with self.tag_indexes_lock:
+            tag_index = self.tag_indexes.get(identity.common_dir)
+
+        if tag_index and tag_index.stamp == refs_stamp(identity.common_dir):
+            return tag_index.tags_for_commit(commit)
+
+        names = self.repo(identity).git.for_each_ref('--points-at={}'.format(commit),
+                                                     '--format=%(refname:strip=2)',
+                                                     'refs/tags').splitlines()
+
+        return sorted(names, key=natural_key, reverse=True)
 
 
     ##
     # Filesystem methods
 
     def collect_repositories(self, path):
-        repos = []
+        """ Returns the identities of all repositories found below path """
 
         self.log.debug('DETECT REPOSITORIES IN PATH: {}'.format(path))
 
-        with os.scandir(path) as dirnames:
-            for sub_dir in dirnames:
-                # print('path {}'.format(path))
-                # print('sub {}'.format(sub_dir))
+        repo_paths = self.repo_registry.discover(path or '.',
+                                                 max_depth = self.discovery_depth,
+                                                 excludes = self.discovery_excludes)
 
-                if not path == None:
-                    repo_path = os.path.join(path, sub_dir)
+        return [self.identity(repo_path, base_path=path or '.') for repo_path in repo_paths]
 
-                else:
-                    repo_path = os.path.join('./',sub_dir)
 
-                if self.is_git_dir(repo_path):
-                    repos.append(Repo(repo_path))
+    def identity(self, repo_path, base_path=None):
+        """ Returns the memoized RepoIdentity of the repository rooted at repo_path,
+            named relative to base_path if given """
+
+        repo_path = os.path.abspath(repo_path)
+        base_path = os.path.abspath(base_path) if base_path else None
+        key = (repo_path, base_path)
 
-        return repos
+        with self.identities_lock:
+            if key not in self.identities:
+                self.identities[key] = RepoIdentity.from_root(repo_path, base_path)
+
+            return self.identities[key]
 
 
     def load_repositories(self, path):
         """ Checks existence of repository paths and initiates clone """
-        destination_path = os.path.dirname(path)
+        destination_path = os.path.dirname(os.path.abspath(path))
+        missing_urls_by_path = {}
+
         for repo_name in self.repo_names_and_urls:
             url = self.repo_names_and_urls[repo_name]
             repo_path = os.path.normpath("{}/{}".format(destination_path, repo_name))
@@ -580,27 +1547,29 @@ class Git():
             if os.path.exists(repo_path):
                 self.log.info('[{}]: Repository exists.'.format(repo_name))
 
-                repo = Repo(repo_path)
-                assert not repo.bare
-                self.repositories[repo_name] = repo
+                identity = self.identity(repo_path)
+                assert not self.repo(identity).bare
+                self.repositories[repo_name] = identity
 
             else:
                 self.log.info('[{}]: Repository does not exist. Attempting to clone it...'.format(repo_name))
-                # @todo: Implement
-                #  self.clone_repository(destination=repo_path, url=url)
+                missing_urls_by_path[repo_path] = url
+
+        # Clones wait on the network, all of them run concurrently
+        if missing_urls_by_path:
+            for identity in self.clone_repositories(missing_urls_by_path):
+                self.repositories[identity.name] = identity
 
 
     def search_directory(self, directory, path='.'):
-        normalized_dirname = directory.lower()
         found_paths = []
 
         for dirpath, dirnames, files in os.walk(path):
 
-            # Skip .git folder
-            if ".git" in dirpath:
-                continue
+            # Skip .git folder without descending into it
+            dirnames[:] = sorted(d for d in dirnames if not is_ignored_dir(d))
 
-            if normalized_dirname in dirpath.lower():
+            if directory_matches(os.path.relpath(dirpath, path), directory):
                 self.log.info('Found Directory {}'.format(dirpath))
                 found_paths.append(dirpath)
 
@@ -608,35 +1577,62 @@ class Git():
 
 
     def search_files(self, filename, path='.', extension=''):
-        extension = extension.lower()
         found_paths = []
 
         for dirpath, dirnames, files in os.walk(path):
 
-            # Skip .git folder
-            if ".git" in dirpath:
-                continue
+            # Skip .git folder without descending into it
+            dirnames[:] = sorted(d for d in dirnames if not is_ignored_dir(d))
+
+            for file in sorted(files):
+                if file_matches(file, filename, extension):
+                    foundPath = os.path.join(dirpath, file)
+                    self.log.info('Found {}'.format(foundPath))
+                    found_paths.append(foundPath)
+
+        return found_paths
+
+
+    def search_patterns(self, patterns, path='.'):
+        """ Returns {(filename, extension): first matching path} for many patterns in
+            a single walk. Same order as search_files, patterns without a match are left out """
+
+        found_paths = {}
+        pending = list(OrderedDict.fromkeys(patterns))
+
+        for dirpath, dirnames, files in os.walk(path):
+
+            # Skip .git folder without descending into it
+            dirnames[:] = sorted(d for d in dirnames if not is_ignored_dir(d))
+
+            for file in sorted(files):
+                for pattern in list(pending):
+                    if file_matches(file, *pattern):
+                        found_paths[pattern] = os.path.join(dirpath, file)
+                        self.log.info('Found {}'.format(found_paths[pattern]))
+                        pending.remove(pattern)
+
+            if not pending:
+                break
 
-            for file in files:
-                if extension and file.lower().endswith(extension):
-                    if filename.lower() in file.lower():
-                        foundPath = os.path.join(dirpath, file)
-                        self.log.info('Found {}'.format(foundPath))
-                        found_paths.append(foundPath)
-                #  elif not extension:
-                    #  print(os.path.join(dirpath, file))
         return found_paths
 
 
     def copy_file_to_destination(self, path, destination):
         self.log.info('Copying from:\n{}\nto:\n{}'.format(path, destination))
 
-        if os.path.exists(path):
+        if os.path.exists(path) and self.archive:
+            self.archive.add_file(path, self.archive.name_for(destination))
+
+        elif os.path.exists(path):
 
             if not os.path.exists(os.path.dirname(destination)):
                 os.makedirs(os.path.dirname(destination))
             try:
-                copyfile(path, destination)
+                if self.object_store:
+                    self.object_store.link(self.object_store.add_file(path), destination)
+                else:
+                    replace_file(destination, file_writer(path))
             except IOError:
                 self.log.info(IOError.message)
         else:
@@ -646,24 +1642,107 @@ class Git():
     def copy_directory_to_destination(self, path, destination):
         self.log.info('Copying from:\n{}\nto:\n{}'.format(path, destination))
 
-        if os.path.exists(path):
+        if os.path.exists(path) and self.archive:
+            for dirpath, dirnames, files in os.walk(path):
+                for file in files:
+                    source = os.path.join(dirpath, file)
+                    self.archive.add_file(source, self.archive.name_for(os.path.join(destination, os.path.relpath(source, path))))
+
+        elif os.path.exists(path):
 
             if not os.path.exists(os.path.dirname(destination)):
                 os.makedirs(os.path.dirname(destination))
             try:
-                copy_tree(path, destination)
+                if self.object_store:
+                    self.link_directory_to_destination(path, destination)
+                else:
+                    self.copy_files_to_directory(path, destination)
             except IOError:
                 self.log.info(IOError.message)
         else:
             self.log.info('File does not exist. Aborting...')
 
 
+    def copy_files_to_directory(self, path, destination):
+        """ Copies the tree below path into destination, keeping file modes. Existing files are replaced, not written through """
+
+        for dirpath, dirnames, files in os.walk(path):
+            target_path = os.path.join(destination, os.path.relpath(dirpath, path))
+            os.makedirs(target_path, exist_ok=True)
+
+            for file in files:
+                source = os.path.join(dirpath, file)
+                replace_file(os.path.join(target_path, file),
+                             file_writer(source),
+                             stat.S_IMODE(os.stat(source).st_mode))
+
+
+    def link_directory_to_destination(self, path, destination):
+        """ copy_files_to_directory counterpart for the object store: every file becomes a hardlink into the store """
+
+        for dirpath, dirnames, files in os.walk(path):
+            for file in files:
+                source = os.path.join(dirpath, file)
+                self.object_store.link(self.object_store.add_file(source),
+                                       os.path.join(destination, os.path.relpath(source, path)))
+
+
+    def write_blob_to_destination(self, identity, entry, destination):
+        """ Streams the blob behind entry straight from the object database into destination """
+
+        self.log.debug('Writing blob {} ({})\nto:\n{}'.format(entry.sha, entry.path, destination))
+
+        executable = (entry.mode == TreeEntry.EXECUTABLE_MODE)
+
+        if self.archive:
+            with self.cat_file(identity) as cat_file, cat_file.stream(entry.sha) as (sha, type, size, reader):
+                self.archive.add_stream(self.archive.name_for(destination), size, reader, executable)
+            return
+
+        if not os.path.exists(os.path.dirname(destination)):
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+
+        def write(fh):
+            with self.cat_file(identity) as cat_file, cat_file.stream(entry.sha) as (sha, type, size, reader):
+                copyfileobj(reader, fh)
+
+        if self.object_store:
+            # Blobs shared between repos are read from git and written to disk only once
+            store_path = self.object_store.add_blob(entry.sha, executable, write)
+            self.object_store.link(store_path, destination)
+            return
+
+        replace_file(destination, write, 0o755 if executable else 0o644)
+
+
+    def write_tree_to_destination(self, identity, tree, path, destination):
+        """ Writes every blob below path of the provided tree into destination.
+            Returns {<written path>: {'path': <path in tree>, 'blob': <blob id>}} """
+
+        self.log.info('Writing tree {}:{}\nto:\n{}'.format(tree.commit[:7], path, destination))
+
+        outputs = {}
+
+        for relative_path, entry in tree.blobs_below(path):
+            blob_destination = os.path.join(destination, *relative_path.split('/'))
+            self.write_blob_to_destination(identity = identity,
+                                           entry = entry,
+                                           destination = blob_destination)
+
+            outputs[blob_destination] = {'path': entry.path, 'blob': entry.sha}
+
+        return outputs
+
+
     ##
     # Helper methods
 
     def is_git_dir(self, path):
         """ Returns True if path contains valid Git repo """
 
+        if not is_repo_root(path):
+            return False
+
         try:
             Repo(path)
             return True
@@ -671,11 +1750,10 @@ class Git():
             return False
 
 
-    def get_repo_name(self, repo):
+    def get_repo_name(self, identity):
         """ Returns name of provided repo """
 
-        repo_path = self.get_root(repo)
-        repo_name = os.path.basename(repo_path)
+        repo_name = identity.name
         return repo_name
 
 
@@ -704,6 +1782,98 @@ class Git():
         self.should_autostash = flag
 
 
+    def set_should_use_cache(self, flag):
+        """ Extraction Cache Setter """
+
+        self.should_use_cache = flag
+
+
+    def set_should_run_incremental(self, flag):
+        """ Incremental Run Setter """
+
+        self.should_run_incremental = flag
+
+
+    def set_should_dedup(self, flag):
+        """ Content-Addressed Output Setter """
+
+        self.object_store = ObjectStore(os.path.join(self.state_path, 'objects')) if flag else None
+
+
+    def set_engine(self, engine, max_tasks_per_child=25):
+        """ Execution Engine Setter """
+
+        self.engine = engine
+        self.max_tasks_per_child = max_tasks_per_child
+
+
+    def set_discovery(self, depth, excludes=()):
+        """ Repository Discovery Setter. excludes are globs on top of the defaults """
+
+        self.discovery_depth = depth
+        self.discovery_excludes = DEFAULT_EXCLUDES + list(excludes)
+
+
+    def set_fetch_jobs(self, count, max_open_files=None):
+        """ Network Concurrency Setter. max_open_files caps the descriptors used by git children """
+
+        self.fetch_jobs = count
+        self.max_open_files = max_open_files
+
+
+    def settings(self):
+        """ Returns the configured flags as a picklable dict, see apply_settings """
+
+        return {'verbose': self.verbose,
+                'should_prune': self.should_prune,
+                'should_autostash': self.should_autostash,
+                'should_use_cache': self.should_use_cache,
+                'should_run_incremental': self.should_run_incremental,
+                'should_dedup': self.object_store is not None,
+                'extraction_mode': self.extraction_mode,
+                'object_pool_path': self.object_pool.path}
+
+
+    def apply_settings(self, settings):
+        """ Configures this instance like the one settings() was taken from """
+
+        self.set_verbose(settings['verbose'])
+        self.set_should_prune(settings['should_prune'])
+        self.set_should_autostash(settings['should_autostash'])
+        self.set_should_use_cache(settings['should_use_cache'])
+        self.set_should_run_incremental(settings['should_run_incremental'])
+        self.set_should_dedup(settings['should_dedup'])
+        self.set_extraction_mode(settings['extraction_mode'])
+        self.set_object_pool_path(settings['object_pool_path'])
+
+
+    def set_clone_options(self, partial=False, depth=None):
+        """ Clone Options Setter. partial skips blobs until checkout, depth limits history """
+
+        self.should_clone_partial = partial
+        self.clone_depth = depth
+
+
+    def set_object_pool_path(self, path):
+        """ Object Pool Path Setter """
+
+        self.object_pool = ObjectPool(os.path.abspath(path))
+
+
+    def set_update_mode(self, mode):
+        """ Update Mode Setter """
+
+        assert mode in Git.UPDATE_MODES
+        self.update_mode = mode
+
+
+    def set_extraction_mode(self, mode):
+        """ Extraction Mode Setter """
+
+        assert mode in Git.EXTRACTION_MODES
+        self.extraction_mode = mode
+
+
     def set_create_logfile(self, flag):
         """ Create Logfile Setter """
 
@@ -13,6 +13,8 @@
 
 from .git import Git
 from .gitlab import GitlabWrapper
+from .statusmodel import StatusModel
+from .progress import ProgressAggregator
 from git import RemoteProgress
 from git.exc import GitCommandError
 
@@ -20,9 +22,7 @@ import os
 import re
 
 import PySimpleGUI as gui
-from pathos.multiprocessing import ProcessingPool as Pool
 from concurrent import futures
-from concurrent.futures.thread import ThreadPoolExecutor
 
 # Opening paths
 import webbrowser
@@ -59,6 +59,7 @@ txt_destination_dir      = '_txt_destination_dir'
 txt_direct_command       = '_txt_gitcommand'
 txt_extraction_tag       = '_txt_gittag'
 txt_extraction_directory = '_txt_gitdirectory'
+txt_network_summary      = '_txt_networksummary'
 # txt_git_destination      = '_txt_gitdestination'
 
 btn_path_browse      = '_btn_folderbrowse'
@@ -77,6 +78,7 @@ cb_prune        = '_cb_prune'
 # cb_log          = '_cb_log'
 # cb_verbose      = '_cb_verbose'
 cb_confirmation = '_cb_confirmation'
+cb_extract_tree = '_cb_extract_tree'
 
 ##
 # Gitlab GUI
@@ -114,12 +116,21 @@ txt_head_state         = '_txt_head_state'
 txt_name               = '_txt_name'
 txt_status             = '_txt_status'
 txt_upstream           = '_txt_upstream'
+sl_table_scroll        = '_sl_tablescroll'
+
+##
+# Widgets exist for this many table rows only. They are reused for whichever
+# repos are scrolled into view, so the window doesn't grow with the farm
+visible_rows = 12
 
 na_string = '—'
 cmd_fetch = 'fetch'
 cmd_stash = 'stash'
 cmd_pull = 'pull'
 
+# Everything from the first control character on is terminal noise
+control_characters = re.compile(r'[\x00-\x1f]')
+
 
 class ProgressPrinter(RemoteProgress):
     ##
@@ -167,19 +178,7 @@ class ProgressPrinter(RemoteProgress):
         for sline in sub_lines:
             # find escape characters and cut them away - regex will not work with
             # them as they are non-ascii. As git might expect a tty, it will send them
-            last_valid_index = None
-
-            for i, c in enumerate(reversed(sline)):
-
-                if ord(c) < 32:
-                    # its a slice index
-                    last_valid_index = -i - 1
-                # END character was non-ascii
-            # END for each character in sline
-            if last_valid_index is not None:
-                sline = sline[:last_valid_index]
-            # END cut away invalid part
-            sline = sline.rstrip()
+            sline = control_characters.split(sline, 1)[0].rstrip()
 
             cur_count, max_count = None, None
             match = self.re_op_relative.match(sline)
@@ -270,11 +269,12 @@ class GUI:
         self.git       = Git(self.path)
         self.gitlab    = GitlabWrapper()
 
-        # Flag breaking the mainloop
-        self.changed_layout = False
-
         self.repos = self.get_repositories_in_path(self.path)
 
+        # Index of the repo shown in the first table row
+        self.scroll_offset = 0
+
+        self.status_model = None
         self.reset_maps()
 
         self.gitlab_status_message   = ''
@@ -301,6 +301,14 @@ class GUI:
         self.r_idx_active_cmd_map            = {}
         self.r_idx_behind_origin_map         = {}
         self.r_idx_last_action_timestamp_map = {}
+        self.r_idx_rendered_map              = {}
+
+        # Background state for the (possibly new) list of repos
+        if self.status_model:
+            self.status_model.stop()
+
+        self.status_model = StatusModel(self.git, self.repos)
+        self.status_model.start()
 
         for r_idx, repo in enumerate(self.repos):
             self.reset_progress_for_repo_idx(r_idx)
@@ -327,6 +335,7 @@ class GUI:
     def initialize_dicts_for_repo_count(self, count):
 
         for r_idx in range(0, count):
+            self.r_idx_is_selected[r_idx]               = True
             self.r_idx_active_cmd_map[r_idx]            = na_string
             self.r_idx_progress_map[r_idx]              = 0
             self.r_idx_progress_message_map[r_idx]      = ''
@@ -500,44 +509,55 @@ class GUI:
                             size=sizes[btn_open])
                   ]]
 
-        # Ignore the pooling completely, if we are limited to one core anyway.
+        # Fixed row slots, filled from self.repos starting at self.scroll_offset
+        rows_layout = []
 
-        # @Refactor: Threadpool crashes when changing the main-path and redrawing is. Most certainly
-        # because of the recursive call within create_window(). Since the performance gain is neglectable,
-        # and I'm super short on time, I force this section to run single threadedly.
-        if (False):
-        # if (self.cpu_count > 1):
-            with Pool(processes=self.cpu_count) as pool:
-                layout_rows = list(pool.map(lambda e: self.table_row_layout_for_repo(e[0], e[1]),
-                                            enumerate(self.repos)))
-        else:
-            layout_rows = list(map(lambda e: self.table_row_layout_for_repo(e[0], e[1]),
-                                   enumerate(self.repos)))
+        for slot in range(0, visible_rows):
+            rows_layout = rows_layout + self.table_row_layout_for_slot(slot)
 
-        # Unwrap the inner lists
-        # TODO: After an hour of debugging this was a working solution. A quick guess is, that the
-        # list(...) function call wraps the lists another time. In this case I would have expected a
-        # _single_ inner list which I could unwrap: [layout_rows] = list(map(...)). I can't though.
-        # Fix if you have time to spare. For now take this "temporary" solution.
+        layout = layout + [[gui.Column(rows_layout,
+                                       pad = (0, 0)),
 
-        for n in layout_rows:
-            layout = layout + n
+                            gui.Slider(range = (0, 0),
+                                       default_value = 0,
+                                       orientation = 'v',
+                                       size = (visible_rows * 2, 15),
+                                       disable_number_display = True,
+                                       enable_events = True,
+                                       key = sl_table_scroll)]]
 
-        print('\n'.format(layout))
         return layout
 
 
     def fetch_repos(self, repos):
         # get indeces from main repo list
         indeces = [self.repos.index(r) for r in repos]
-        if (self.cpu_count > 1):
-            with ThreadPoolExecutor(max_workers=self.cpu_count) as executor:
-                for idx in indeces:
-                    executor.submit(self.fetch_index, idx)
 
-        else:
-            for idx in indeces:
-                self.fetch_index(idx = idx)
+        # Only fetch actual branches which have an origin to fetch from
+        indeces = [idx for idx in indeces if self.can_fetch_index(idx)]
+
+        for idx in indeces:
+            self.r_idx_active_cmd_map[idx] = cmd_fetch
+            self.r_idx_progress_map[idx]   = 0
+
+        idx_by_identity = {self.repos[idx]: idx for idx in indeces}
+        aggregator = None
+
+        def progress(identity, state):
+            self.set_progress(idx_by_identity[identity], state['message'], state['progress'])
+
+            # The fetch blocks the event loop, so draw the (rate limited) progress right away
+            self.window.FindElement(txt_network_summary).Update(value = aggregator.summary())
+            self.refresh_table()
+            self.window.Refresh()
+
+        aggregator = ProgressAggregator(progress)
+
+        self.git.fetch_repos([self.repos[idx] for idx in indeces], progress=aggregator.feed)
+        aggregator.flush()
+
+        for idx in indeces:
+            self.finish_fetch_index(idx)
 
         self.did_fetch = True
 
@@ -546,66 +566,53 @@ class GUI:
         self.fetch_repos(self.repos)
 
 
-    def fetch_index(self, idx):
+    def can_fetch_index(self, idx):
+        """ Returns True if the repo at idx has a checked out branch and an origin """
 
-        repo = self.repos[idx]
+        identity = self.repos[idx]
 
         # Name of current branch
-        branch = '{}'.format(self.git.active_branch(repo))
-        print('{} BRANCH:{}'.format(idx, branch))
-
-        # Description of Head State
-        head_state = '{}'.format(self.git.head_state(repo))
+        branch = '{}'.format(self.git.active_branch(identity))
 
         # Set to -1 so that we can distinguish if this value has been updated
-        behind = -1
+        self.r_idx_behind_origin_map[idx] = -1
 
         # Assure we are fetching an actual branch
-        print('1{}'.format(idx))
-        if (branch in repo.branches):
+        metadata = self.git.repo_metadata(identity)
 
-            print('2{}'.format(idx))
-            # Assure we have remotes to fetch from
-            if (len(repo.remotes) > 0):
-                print('3{}'.format(idx))
+        if branch not in metadata['branches']:
+            return False
 
-                # Search for origin
-                for r in repo.remotes:
+        # Search for origin
+        return 'origin' in metadata['remotes']
 
-                    if r.name == 'origin':
-                        print('4{}'.format(idx))
-                        self.r_idx_active_cmd_map[idx] = cmd_fetch
-                        self.r_idx_progress_map[idx]   = 0
 
-                        print('{} Fetch about to start'.format(idx))
-                        progress_printer = ProgressPrinter()
+    def finish_fetch_index(self, idx):
 
-                        # Abusing Python here a bit.
-                        progress_printer.r_idx = idx
-                        progress_printer.delegate = self
+        identity = self.repos[idx]
+        branch = '{}'.format(self.git.active_branch(identity))
 
-                        fetch_result = self.git.fetch(repo, progress_printer = progress_printer)
-                        # fetch_result = self.git.fetch(repo)
+        # We got the fetch results > Progress finished
+        self.r_idx_last_action_timestamp_map[idx] = datetime.now()
 
-                        print(fetch_result)
-                        # We got the fetch results > Progress finished
-                        self.r_idx_last_action_timestamp_map[idx] = datetime.now()
+        try:
+            self.r_idx_behind_origin_map[idx] = self.git.behind_branch(identity, 'origin', branch)
 
-                        behind = self.git.behind_branch(repo, 'origin', branch)
-                        break
-
-        self.r_idx_behind_origin_map[idx] = behind
+        except GitCommandError:
+            # Branch has no counterpart on origin
+            self.r_idx_behind_origin_map[idx] = -1
 
 
     def merge_index(self, idx):
 
-        repo = self.repos[idx]
+        identity = self.repos[idx]
+        repo = self.git.repo(identity)
 
         # Name of current branch
-        branch = '{}'.format(self.git.active_branch(repo))
+        branch = '{}'.format(self.git.active_branch(identity))
 
         # Descriptio of Head State
-        head_state = '{}'.format(self.git.head_state(repo))
+        head_state = '{}'.format(self.git.head_state(identity))
 
         # Set to -1 so that we can distinguish if this value has been updated
         behind = -1
@@ -630,15 +637,15 @@ class GUI:
                         progress_printer.repo_idx = idx
                         progress_printer.delegate = self
 
-                        fetch_result = self.git.fetch(repo, progress_printer = progress_printer)
-                        behind       = self.git.behind_branch(repo, 'origin', branch)
+                        fetch_result = self.git.fetch(identity, progress_printer = progress_printer)
+                        behind       = self.git.behind_branch(identity, 'origin', branch)
                         break
 
         self.r_idx_behind_origin_map[idx] = behind
 
 
-    def table_row_layout_for_repo(self, idx, repo):
-        """ Takes index and repo to generate a table row for it. """
+    def table_row_layout_for_slot(self, idx):
+        """ Takes the index of a row slot to generate an empty table row for it. """
 
         sizes = self.table_sizes_dict()
 
@@ -653,7 +660,7 @@ class GUI:
                             size = sizes[cb_active],
                             key='{}{}'.format(idx, cb_active)),
 
-                   gui.Text('{}'.format('Loading'),
+                   gui.Text('{}'.format(''),
                             font = 'Helvetica 10 bold',
                             size = sizes[txt_name],
                             key = '{}{}'.format(idx, txt_name)),
@@ -772,18 +779,72 @@ class GUI:
                                      text_color = gitlab_status_color)
 
 
+    def refresh_table(self):
+        """ Renders the repos scrolled into view into the row slots """
+
+        # Only these are polled by the status model
+        self.status_model.set_visible(self.repos[self.scroll_offset:self.scroll_offset + visible_rows])
+
+        for slot in range(0, visible_rows):
+            r_idx = self.scroll_offset + slot
+
+            if r_idx < len(self.repos):
+                self.refresh_gui_for_repo_idx(r_idx, True)
+
+            else:
+                self.clear_slot(slot)
+
+
+    def clear_slot(self, slot, name = '', selected = None):
+        """ Blanks a row slot. Without selection the checkbox is disabled, the slot holds no repo """
+
+        row = ('empty', name, selected)
+
+        if self.r_idx_rendered_map.get(slot) == row:
+            return
+
+        self.r_idx_rendered_map[slot] = row
+
+        for key in [txt_current_action, txt_head_state, txt_status, txt_upstream]:
+            self.window.FindElement('{}{}'.format(slot, key)).Update(value = '')
+
+        self.window.FindElement('{}{}'.format(slot, txt_name)).Update(value = name)
+        self.window.FindElement('{}{}'.format(slot, cb_active)).Update(value = bool(selected),
+                                                                       disabled = (selected is None))
+
+        for key in [combo_branches, combo_tags]:
+            self.window.FindElement('{}{}'.format(slot, key)).Update(values = [na_string],
+                                                                     set_to_index = 0,
+                                                                     disabled = True)
+
+        self.window.FindElement('{}{}'.format(slot, btn_stash)).Update(disabled = True)
+        self.window.FindElement('{}{}'.format(slot, btn_open)).Update(disabled = (selected is None))
+        self.window.FindElement('{}{}'.format(slot, pb_repo_action)).UpdateBar(0)
+
+
     def refresh_gui_for_repo_idx(self, r_idx, include_tags = False):
+        """ Renders repo r_idx into the row slot it is scrolled into """
 
-        repo = self.repos[r_idx]
-        assert repo
+        identity = self.repos[r_idx]
+        assert identity
 
-        name = self.git.get_repo_name(repo)
+        slot = r_idx - self.scroll_offset
+
+        # Repo state is kept current by the status model, no git calls on the Tk loop
+        version, state = self.status_model.get(identity)
+
+        if state is None:
+            # Not loaded yet
+            self.clear_slot(slot, 'Loading', self.r_idx_is_selected[r_idx])
+            return
+
+        name = state['name']
 
         status_color     = 'black'
         upstream_color   = 'black'
         head_state_color = 'black'
 
-        is_dirty = self.git.is_dirty(repo)
+        is_dirty = state['dirty']
 
         if (is_dirty):
             status       = 'Dirty'
@@ -793,7 +854,7 @@ class GUI:
             status = 'Clean'
 
         # Name of current branch
-        branch = '{}'.format(self.git.active_branch(repo))
+        branch = '{}'.format(state['branch'])
 
         # Description of head state
         head_state = na_string
@@ -801,9 +862,9 @@ class GUI:
         # last finished progress
         if (datetime.now() - self.r_idx_last_action_timestamp_map[r_idx] > timedelta(seconds=5)):
             # 5 Seconds have passed since last progress message change
-            head_state = '{}'.format(self.git.head_state(repo))
+            head_state = '{}'.format(state['head_state'])
 
-            if (repo.head.is_detached):
+            if (state['detached']):
                 head_state_color = color_highlight
 
         else:
@@ -812,18 +873,18 @@ class GUI:
             self.reset_progress_for_repo_idx(r_idx)
 
 
-        tags = [re.sub(r'refs/tags/', '', '{}'.format(t)) for t in repo.tags]
+        # Sorted by the status model already
+        tags = list(state['tags'])
         no_tags_available = (len(tags) == 0)
 
         if (no_tags_available):
             tags.append('No Tags')
 
         else:
-            tags.sort(reverse=True)
             tags.insert(0, na_string) # No selection
 
 
-        branches = [re.sub(r'refs/heads/', '', '{}'.format(b)) for b in repo.branches]
+        branches = list(state['branches'])
         no_branches_available = (len(branches) == 0)
 
         if (no_branches_available):
@@ -832,16 +893,35 @@ class GUI:
         else:
             branches.insert(0, na_string) # No selection
 
-        gui_txt_git_cmd    = self.window.FindElement('{}{}'.format(r_idx, txt_current_action))
-        gui_txt_name       = self.window.FindElement('{}{}'.format(r_idx, txt_name))
-        gui_txt_head_state = self.window.FindElement('{}{}'.format(r_idx, txt_head_state))
-        gui_txt_status     = self.window.FindElement('{}{}'.format(r_idx, txt_status))
-        gui_txt_upstream   = self.window.FindElement('{}{}'.format(r_idx, txt_upstream))
-        gui_combo_branches = self.window.FindElement('{}{}'.format(r_idx, combo_branches))
-        gui_combo_tags     = self.window.FindElement('{}{}'.format(r_idx, combo_tags))
-        gui_btn_stash      = self.window.FindElement('{}{}'.format(r_idx, btn_stash))
-
         active_command = self.r_idx_active_cmd_map[r_idx]
+        progress       = self.r_idx_progress_map[r_idx]
+        behind_count   = self.r_idx_behind_origin_map[r_idx]
+        is_selected    = self.r_idx_is_selected[r_idx]
+
+        # Only touch the widgets of slots whose content changed since the last tick
+        row = (r_idx, version, include_tags, head_state, head_state_color, active_command, progress, behind_count, is_selected)
+
+        if self.r_idx_rendered_map.get(slot) == row:
+            return
+
+        self.r_idx_rendered_map[slot] = row
+
+        gui_txt_git_cmd    = self.window.FindElement('{}{}'.format(slot, txt_current_action))
+        gui_txt_name       = self.window.FindElement('{}{}'.format(slot, txt_name))
+        gui_txt_head_state = self.window.FindElement('{}{}'.format(slot, txt_head_state))
+        gui_txt_status     = self.window.FindElement('{}{}'.format(slot, txt_status))
+        gui_txt_upstream   = self.window.FindElement('{}{}'.format(slot, txt_upstream))
+        gui_combo_branches = self.window.FindElement('{}{}'.format(slot, combo_branches))
+        gui_combo_tags     = self.window.FindElement('{}{}'.format(slot, combo_tags))
+        gui_btn_stash      = self.window.FindElement('{}{}'.format(slot, btn_stash))
+        gui_pb_repo_action = self.window.FindElement('{}{}'.format(slot, pb_repo_action))
+        gui_cb_active      = self.window.FindElement('{}{}'.format(slot, cb_active))
+        gui_btn_open       = self.window.FindElement('{}{}'.format(slot, btn_open))
+
+        gui_pb_repo_action.UpdateBar(progress)
+        gui_cb_active.Update(value = is_selected, disabled = False)
+        gui_btn_open.Update(disabled = False)
+
         active_command_color = 'black' if (active_command == na_string) else color_accent
 
         gui_txt_git_cmd.Update(value = active_command,
@@ -856,7 +936,6 @@ class GUI:
                               text_color = status_color)
 
 
-        behind_count = self.r_idx_behind_origin_map[r_idx]
         upstream = ''
 
         if (behind_count == -1):
@@ -908,6 +987,7 @@ class GUI:
             # self.should_log       = values[cb_log]
             # self.is_verbose       = values[cb_verbose]
             self.is_confirmed     = values[cb_confirmation]
+            self.extract_from_tree = values[cb_extract_tree]
 
             # Assign input fields
             self.destination_dir      = values[txt_destination_dir]
@@ -920,8 +1000,6 @@ class GUI:
 
             if changed_path:
                 self.path = selected_path
-                self.repos = self.get_repositories_in_path(self.path)
-                self.changed_layout = True
 
             # TODO Remove if this feature is dropped
             self.extraction_filename  = ''
@@ -940,10 +1018,14 @@ class GUI:
             self.gitlab_description    = values[txt_gitlab_description]
             self.gitlab_administrators = values[txt_gitlab_administrators].split()
 
-            if not changed_path:
-                for idx in range(0, len(self.repos)):
-                    active = values['{}{}'.format(idx, cb_active)]
-                    self.r_idx_is_selected[idx] = active
+            # Checkboxes show the repos of the current offset, store them before scrolling
+            for slot in range(0, visible_rows):
+                r_idx = self.scroll_offset + slot
+
+                if r_idx < len(self.repos):
+                    self.r_idx_is_selected[r_idx] = values['{}{}'.format(slot, cb_active)]
+
+            self.scroll_offset = min(int(values[sl_table_scroll]), self.max_scroll_offset())
 
             return changed_path
 
@@ -976,7 +1058,11 @@ class GUI:
 
         # These elements will be placed directly below the table and are not mode specific
         main_button_row_layout = [
-            [gui.Text('Selection:')],
+            [gui.Text('Selection:'),
+
+             gui.Text('',
+                      size=(80, 1),
+                      key=txt_network_summary)],
             [gui.Button('Invert',
                         key=btn_invert_selection),
 
@@ -1053,7 +1139,11 @@ class GUI:
 
               [gui.Button('Extract',
                           disabled=False,
-                          key=btn_extract)]]
+                          key=btn_extract),
+
+               gui.CBox('Keep HEAD (extract straight from the tag\'s tree)',
+                        default=False,
+                        key=cb_extract_tree)]]
 
         # Bottom Tab assembly
         bottom_tab_layout = [[gui.TabGroup([[gui.Tab('Extraction Mode',
@@ -1093,13 +1183,21 @@ class GUI:
         self.window = gui.Window('TagSnag',
                             icon='tagsnag.ico').Layout(layout).Finalize()
 
-        # GUI Event Loop
-        while not self.changed_layout:
-            event, values = self.window.Read(timeout=5)
+        self.refresh_scroll_range()
+
+        # GUI Event Loop. Repo state arrives from the status model, a tick only
+        # pushes rows that changed, so there is no need to spin faster than that
+        while True:
+            event, values = self.window.Read(timeout=50)
+
+            if event is None:
+                # Window closed, values are gone as well
+                break
+
             changed_path = self.assign_values(values)
 
             if changed_path:
-                break;
+                self.reload_repositories()
 
             # include_tags = False
             # if self.did_fetch:
@@ -1108,69 +1206,74 @@ class GUI:
 
             self.refresh_static_gui()
 
-            for i in range(0, (len(self.repos))):
-                self.window.FindElement('{}{}'.format(i, pb_repo_action)).UpdateBar(self.r_idx_progress_map[i])
-                # self.refresh_gui_for_repo_idx(i, include_tags)
-                self.refresh_gui_for_repo_idx(i, True)
+            self.refresh_table()
 
             if event != gui.TIMEOUT_KEY:
                 # print(event, values)
                 pass
 
             if event == btn_invert_selection:
-                for i in range(0, (len(self.repos))):
-                    checkbox = self.window.FindElement('{}{}'.format(i, cb_active))
-                    checkbox.Update(value=(not checkbox.Get()))
+                # Includes the repos scrolled out of view
+                for r_idx in range(0, (len(self.repos))):
+                    self.r_idx_is_selected[r_idx] = not self.r_idx_is_selected[r_idx]
+
+                # Push the new state into the visible checkboxes right away. The next tick
+                # reads them back into r_idx_is_selected and would undo the invert otherwise
+                self.refresh_table()
 
             elif btn_stash in event:
-                repo_idx = int(event.split('_')[0])
-                btn_element = '{}{}'.format(repo_idx, btn_stash)
-                status_element = '{}{}'.format(repo_idx, txt_status)
+                repo_idx = self.repo_idx_for_event(event)
+                btn_element = event
+                status_element = '{}{}'.format(repo_idx - self.scroll_offset, txt_status)
 
-                repo = self.repos[repo_idx]
-                assert repo
-                self.git.stash_repo(repo)
+                identity = self.repos[repo_idx]
+                assert identity
+                self.git.stash_repo(identity)
+                self.status_model.invalidate([identity])
 
                 # Update UI
                 self.window.FindElement(btn_element).Update(disabled=True)
                 self.window.FindElement(status_element).Update(value = 'Clean', text_color='black')
 
             elif btn_open in event:
-                repo_idx = int(event.split('_')[0])
-                element_name = '{}{}'.format(repo_idx, btn_open)
+                repo_idx = self.repo_idx_for_event(event)
 
-                repo = self.repos[repo_idx]
-                assert repo
-                path = Path(self.git.get_root(repo))
+                identity = self.repos[repo_idx]
+                assert identity
+                path = Path(identity.root)
 
                 self.open_path(path.absolute())
 
             elif event == btn_checkout_master:
                 selected_repos = self.get_selected_repos()
 
-                for repo in selected_repos:
-                    self.git.checkout(repo, 'master')
+                for identity in selected_repos:
+                    self.git.checkout(identity, 'master')
+
+                self.status_model.invalidate(selected_repos)
 
             elif event == btn_update:
                 selected_repos = self.get_selected_repos()
 
                 self.fetch_repos(selected_repos)
 
-                for repo in selected_repos:
-                    active_branch = self.git.active_branch(repo)
+                for identity in selected_repos:
+                    active_branch = self.git.active_branch(identity)
                     print('Active Branch {}'.format(active_branch))
 
-                    if (active_branch == '') or (repo.head.is_detached):
+                    if (active_branch == '') or (active_branch is None):
                         active_branch = 'master'
 
                     print('Active Branch {}'.format(active_branch))
 
                     # self.git.checkout(repo, '{}'.format(active_branch))
-                    self.git.merge(repo=repo,
+                    self.git.merge(identity=identity,
                                    source_branch_name='origin/{}'.format(active_branch),
                                    target_branch_name='{}'.format(active_branch))
                 # self.git.update_repos(selected_repos)
 
+                self.status_model.invalidate(selected_repos)
+
             elif event == btn_fetch:
                 selected_repos = self.get_selected_repos()
                 self.fetch_repos(selected_repos)
@@ -1182,27 +1285,29 @@ class GUI:
 
             elif combo_branches in event:
                 # Branch selection
-                repo_idx = int(event.split('_')[0])
-                element_name = '{}{}'.format(repo_idx, combo_branches)
-                selected_branch = values[element_name]
+                repo_idx = self.repo_idx_for_event(event)
+                selected_branch = values[event]
 
                 if not selected_branch == na_string:
                     self.git.checkout(self.repos[repo_idx], selected_branch)
+                    self.status_model.invalidate([self.repos[repo_idx]])
 
             elif combo_tags in event:
                 # Tag selection
-                repo_idx = int(event.split('_')[0])
-                element_name = '{}{}'.format(repo_idx, combo_tags)
-                selected_tag = values[element_name]
+                repo_idx = self.repo_idx_for_event(event)
+                selected_tag = values[event]
 
                 if not selected_tag == na_string:
                     self.git.checkout(self.repos[repo_idx], selected_tag)
+                    self.status_model.invalidate([self.repos[repo_idx]])
 
 
             elif event == btn_extract:
                 selected_repos = self.get_selected_repos()
                 # TODO: Implement filename / extension
 
+                self.git.set_extraction_mode(Git.TREE_MODE if self.extract_from_tree else Git.CHECKOUT_MODE)
+
                 did_start = False
                 if self.extraction_tag != '' and self.extraction_filename != '' and self.extraction_extension != '':
                     did_start = True
@@ -1235,16 +1340,18 @@ class GUI:
 
                     self.r_idx_last_action_timestamp_map[idx] = datetime.now()
 
+                self.status_model.invalidate(selected_repos)
+
 
             elif event == btn_execute:
 
                 if self.is_confirmed and self.direct_command != '':
                     # better safe than sorry
                     for idx in self.get_selected_indeces():
-                        repo = self.repos[idx]
+                        identity = self.repos[idx]
 
                         try:
-                            git = repo.git
+                            git = self.git.repo(identity).git
                             git.execute(self.direct_command.split())
 
                             self.r_idx_progress_color_map[idx] = color_positive
@@ -1267,6 +1374,8 @@ class GUI:
                         finally:
                             self.r_idx_last_action_timestamp_map[idx] = datetime.now()
 
+                    self.status_model.invalidate(self.get_selected_repos())
+
                     # self.fetch_repos(self.get_selected_repos())
 
             elif event == btn_gitlab_connect:
@@ -1318,15 +1427,14 @@ class GUI:
                         self.git.clone_url_into_path(url = url,
                                                      path = os.path.join(self.path, repo_name))
 
-                    self.repos = self.get_repositories_in_path(self.path)
-                    self.changed_layout = True
+                    self.reload_repositories()
 
             elif event == 'Show':
                 # change the "output" element to be the value of "input" element
                 # self.window.FindElement('_OUTPUT_').Update(values['_IN_'])
                 pass
 
-            elif event is None or event == btn_exit or event == exit:
+            elif event == btn_exit or event == exit:
                 break
 
             # elif event == btn_contact:
@@ -1337,15 +1445,40 @@ class GUI:
             #     pass
 
         self.window.Close()
+        self.status_model.stop()
+        self.status_model.join()
+        self.git.close()
+
+
+    def reload_repositories(self):
+        """ Swaps the table's data source to the repos in self.path, the window stays """
+
+        self.repos = self.get_repositories_in_path(self.path)
+        self.scroll_offset = 0
+
+        self.reset_maps()
+        self.refresh_scroll_range()
+
+
+    def max_scroll_offset(self):
+        return max(0, len(self.repos) - visible_rows)
+
+
+    def refresh_scroll_range(self):
+        """ Fits the slider to the number of repos """
+
+        max_offset = self.max_scroll_offset()
+        self.scroll_offset = min(self.scroll_offset, max_offset)
+
+        self.window.FindElement(sl_table_scroll).Update(value = self.scroll_offset,
+                                                        range = (0, max_offset),
+                                                        disabled = (max_offset == 0))
 
 
-        # Dirty, recursive solution
-        # @Refactor
+    def repo_idx_for_event(self, event):
+        """ Returns the index of the repo shown in the row slot that sent event """
 
-        if self.changed_layout:
-            self.changed_layout = False
-            self.reset_maps()
-            self.create_window()
+        return self.scroll_offset + int(event.split('_')[0])
 
 
     def open_path(self, path):
@@ -1379,8 +1512,6 @@ class GUI:
     def set_progress(self, r_idx, message, progress):
         progress = min(progress, 1.0)
         progress *= 100
-        print('Progress ={}'.format(round(progress)))
-        print('R_IDX: {} message: {} progress: {}'.format(r_idx, message, progress))
         self.r_idx_progress_map[r_idx] = progress
         self.r_idx_progress_message_map[r_idx] = message
 
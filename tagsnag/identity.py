@@ -0,0 +1,55 @@
+##
+#  identity.py
+#  tagsnag
+#
+#  Created by Thomas Johannesmeyer (thomas@geeky.gent) on 18.10.2026.
+#  Copyright (c) 2026 www.geeky.gent. All rights reserved.
+#
+
+from .refs import common_dir_for
+
+import os
+
+
+class RepoIdentity():
+    """ Where a repository lives: worktree root, name, git dir and common dir
+        (refs and objects, differs for linked worktrees). Computed once from
+        the .git marker, without running git. The name is the root relative to
+        the directory the repo was discovered in ('a/proj'), so nested repos of
+        the same basename keep apart. Without one it is the basename """
+
+    def __init__(self, root, git_dir, common_dir, name=None):
+        self.root = root
+        self.name = name or os.path.basename(root)
+        self.git_dir = git_dir
+        self.common_dir = common_dir
+
+
+    @classmethod
+    def from_root(cls, root, base_path=None):
+        """ Reads the .git marker below root. Worktrees and submodules use a file pointing to the git dir """
+
+        root = os.path.abspath(root)
+        name = os.path.relpath(root, base_path).replace(os.sep, '/') if base_path else None
+        git_dir = os.path.join(root, '.git')
+
+        if os.path.isfile(git_dir):
+            with open(git_dir, 'r') as fh:
+                content = fh.read().strip()
+
+            if content.startswith('gitdir:'):
+                git_dir = os.path.normpath(os.path.join(root, content[len('gitdir:'):].strip()))
+
+        return cls(root, git_dir, common_dir_for(git_dir), name)
+
+
+    def __eq__(self, other):
+        return isinstance(other, RepoIdentity) and self.root == other.root
+
+
+    def __hash__(self):
+        return hash(self.root)
+
+
+    def __repr__(self):
+        return 'RepoIdentity({})'.format(self.root)
@@ -0,0 +1,149 @@
+##
+#  manifest.py
+#  tagsnag
+#
+#  Created by Thomas Johannesmeyer (thomas@geeky.gent) on 18.10.2026.
+#  Copyright (c) 2026 www.geeky.gent. All rights reserved.
+#
+
+import os
+import json
+import hashlib
+import tempfile
+import threading
+
+
+class Manifest():
+    """ Persistent per-repo record of an extraction run: the matched tag, the
+        commit it resolved to, the written files with their content hashes and
+        the outcome. One manifest file is kept per job (kind, tag, pattern,
+        destination), the next run of the same job compares against it. Repos
+        are keyed by their root, names need not be unique """
+
+    ##
+    # Outcomes
+    EXTRACTED = 'extracted'
+    UNCHANGED = 'unchanged'
+    NO_TAG    = 'no-tag'
+    NOT_FOUND = 'not-found'
+    FAILED    = 'failed'
+
+    SUCCESSFUL_OUTCOMES = [EXTRACTED, UNCHANGED]
+
+    def __init__(self, path):
+        self.path = path
+        self.job = None
+        self.previous = {}
+        self.records = {}
+        self.lock = threading.Lock()
+
+
+    def begin(self, kind, tag, pattern, destination):
+        """ Starts recording a new run and loads the previous run of the same job """
+
+        self.job = {'kind': kind,
+                    'tag': tag,
+                    'pattern': pattern,
+                    'destination': os.path.abspath(destination)}
+
+        self.records = {}
+        self.previous = {}
+
+        try:
+            with open(self.path_for_job(), 'r') as fh:
+                self.previous = json.load(fh).get('repos', {})
+
+        except (IOError, ValueError):
+            pass
+
+
+    def record(self, repo_root, repo_name, tag, commit, outcome, outputs=()):
+        """ Records the outcome for the repo at repo_root. outputs is a list of written paths """
+
+        previous = self.previous.get(repo_root, {})
+        hashes = {}
+
+        for path in outputs:
+            # Unchanged outputs have been verified (or trusted) already, don't hash them twice
+            if outcome == Manifest.UNCHANGED and path in previous.get('outputs', {}):
+                hashes[path] = previous['outputs'][path]
+            else:
+                hashes[path] = self.hash_file(path)
+
+        with self.lock:
+            self.records[repo_root] = {'name': repo_name,
+                                       'tag': tag,
+                                       'commit': commit,
+                                       'outcome': outcome,
+                                       'outputs': hashes}
+
+
+    def merge(self, records):
+        """ Applies records of another instance, e.g. in a worker process """
+
+        with self.lock:
+            self.records.update(records)
+
+
+    def is_unchanged(self, repo_root, commit):
+        """ Returns True if the previous run extracted commit for the repo at
+            repo_root successfully and all its output files are still untouched """
+
+        previous = self.previous.get(repo_root)
+
+        if not previous or previous['outcome'] not in Manifest.SUCCESSFUL_OUTCOMES:
+            return False
+
+        if previous['commit'] != commit:
+            return False
+
+        return all(self.hash_file(path) == digest for path, digest in previous['outputs'].items())
+
+
+    def previous_outputs(self, repo_root):
+        """ Returns the output paths recorded for the repo at repo_root by the previous run """
+
+        return list(self.previous.get(repo_root, {}).get('outputs', {}))
+
+
+    def save(self):
+        """ Writes the manifest of the current run """
+
+        if not self.job:
+            return
+
+        with self.lock:
+            content = {'job': self.job, 'repos': self.records}
+
+        try:
+            os.makedirs(self.path, exist_ok=True)
+
+            fd, tmp_path = tempfile.mkstemp(dir=self.path)
+            with os.fdopen(fd, 'w') as fh:
+                json.dump(content, fh, indent=2, sort_keys=True)
+
+            os.replace(tmp_path, self.path_for_job())
+
+        except (IOError, OSError):
+            pass
+
+
+    def path_for_job(self):
+        job_key = json.dumps(self.job, sort_keys=True).encode('utf-8')
+        return os.path.join(self.path, '{}.json'.format(hashlib.sha1(job_key).hexdigest()[:16]))
+
+
+    def hash_file(self, path):
+        """ Returns the sha256 of the file at path or None if it is missing """
+
+        digest = hashlib.sha256()
+
+        try:
+            with open(path, 'rb') as fh:
+                for chunk in iter(lambda: fh.read(1 << 16), b''):
+                    digest.update(chunk)
+
+        except (IOError, OSError):
+            return None
+
+        return digest.hexdigest()
@@ -0,0 +1,118 @@
+##
+#  metadata.py
+#  tagsnag
+#
+#  Created by Thomas Johannesmeyer (thomas@geeky.gent) on 18.10.2026.
+#  Copyright (c) 2026 www.geeky.gent. All rights reserved.
+#
+
+from .refs import refs_stamp
+
+import os
+import json
+import sqlite3
+import threading
+
+
+SCHEMA_VERSION = 1
+
+
+def metadata_stamp(git_dir, common_dir):
+    """ Returns a value that changes whenever HEAD moves, any ref (branch, tag,
+        remote) is added, removed or moved, or the config (e.g. the remotes) changes """
+
+    mtimes = []
+
+    for path in (os.path.join(git_dir, 'HEAD'), os.path.join(common_dir, 'config')):
+        try:
+            mtimes.append(os.stat(path).st_mtime_ns)
+        except OSError:
+            mtimes.append(None)
+
+    return json.dumps(mtimes + [refs_stamp(common_dir, namespace='')])
+
+
+class MetadataCache():
+    """ SQLite table of per-repo metadata (root, name, branch, HEAD, tags,
+        branches, remotes). Rows are keyed by repo path and only valid for
+        the stamp they were stored with """
+
+    def __init__(self, path):
+        self.path = path
+        self.connection = None
+        self.lock = threading.Lock()
+
+
+    def connect(self):
+        """ Opens the database once. Returns None if it can't be used """
+
+        if self.connection is None:
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+                connection = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+
+                if connection.execute('PRAGMA user_version').fetchone()[0] != SCHEMA_VERSION:
+                    connection.execute('DROP TABLE IF EXISTS repos')
+                    connection.execute('PRAGMA user_version = {}'.format(SCHEMA_VERSION))
+
+                connection.execute('CREATE TABLE IF NOT EXISTS repos ('
+                                   'path TEXT PRIMARY KEY, '
+                                   'stamp TEXT NOT NULL, '
+                                   'metadata TEXT NOT NULL)')
+                connection.commit()
+
+                self.connection = connection
+
+            except (sqlite3.Error, OSError):
+                self.connection = False
+
+        return self.connection or None
+
+
+    def get(self, repo_path, stamp):
+        """ Returns the metadata dict stored for repo_path if it was stored with stamp """
+
+        with self.lock:
+            connection = self.connect()
+
+            if not connection:
+                return None
+
+            try:
+                row = connection.execute('SELECT stamp, metadata FROM repos WHERE path = ?', (repo_path,)).fetchone()
+
+            except sqlite3.Error:
+                return None
+
+        if not row or row[0] != stamp:
+            return None
+
+        return json.loads(row[1])
+
+
+    def put(self, repo_path, stamp, metadata):
+        """ Stores metadata for repo_path """
+
+        with self.lock:
+            connection = self.connect()
+
+            if not connection:
+                return
+
+            try:
+                connection.execute('INSERT OR REPLACE INTO repos (path, stamp, metadata) VALUES (?, ?, ?)',
+                                   (repo_path, stamp, json.dumps(metadata)))
+                connection.commit()
+
+            except sqlite3.Error:
+                # The cache is an optimization only, e.g. another process holds the lock
+                pass
+
+
+    def close(self):
+        with self.lock:
+            if self.connection:
+                self.connection.close()
+
+            self.connection = None
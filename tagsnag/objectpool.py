@@ -0,0 +1,112 @@
+##
+#  objectpool.py
+#  tagsnag
+#
+#  Created by Thomas Johannesmeyer (thomas@geeky.gent) on 18.10.2026.
+#  Copyright (c) 2026 www.geeky.gent. All rights reserved.
+#
+
+import os
+import re
+import hashlib
+import subprocess
+
+
+def objects_size(common_dir):
+    """ Returns the bytes used by the object database of a repository """
+
+    size = 0
+
+    for dirpath, dirnames, files in os.walk(os.path.join(common_dir, 'objects')):
+        for name in files:
+            try:
+                size += os.lstat(os.path.join(dirpath, name)).st_size
+            except OSError:
+                pass
+
+    return size
+
+
+class ObjectPool():
+    """ Bare repository holding the objects of all member repos once. Members
+        borrow from it through objects/info/alternates, so the history they
+        share (e.g. a course template) is stored a single time.
+
+        The pool keeps every member's refs under refs/members/, which keeps
+        the borrowed objects reachable. It must never be deleted while members
+        point at it """
+
+    def __init__(self, path):
+        self.path = path
+        self.objects_path = os.path.join(path, 'objects')
+
+
+    def exists(self):
+        return os.path.isdir(self.objects_path)
+
+
+    def ensure(self):
+        """ Creates the pool if needed """
+
+        if self.exists():
+            return
+
+        self.run(['git', 'init', '--bare', '--quiet', self.path])
+
+        # Members rely on every object ever fetched, never prune unreachable ones
+        self.run(['git', '-C', self.path, 'config', 'gc.pruneExpire', 'never'])
+
+
+    def namespace(self, identity):
+        """ Returns the ref namespace of a member. The name is reduced to characters valid in
+            any ref name, the path hash keeps repos apart whose names end up the same """
+
+        digest = hashlib.sha1(identity.root.encode('utf-8')).hexdigest()[:8]
+        name = re.sub(r'[^A-Za-z0-9_-]+', '-', identity.name).strip('-')
+
+        return 'refs/members/{}-{}'.format(name, digest)
+
+
+    def add(self, identity):
+        """ Copies all refs (and with them all objects) of a member into the pool and
+            links the member to it. Raises CalledProcessError if git fails """
+
+        self.ensure()
+
+        self.run(['git', '-C', self.path, 'fetch', '--quiet', '--no-tags',
+                  identity.common_dir, '+refs/*:{}/*'.format(self.namespace(identity))])
+
+        self.link(identity)
+
+
+    def link(self, identity):
+        """ Adds the pool to the member's alternates, once """
+
+        info_path = os.path.join(identity.common_dir, 'objects', 'info')
+        alternates_path = os.path.join(info_path, 'alternates')
+
+        content = ''
+
+        if os.path.exists(alternates_path):
+            with open(alternates_path, 'r') as fh:
+                content = fh.read()
+
+        if self.objects_path in content.splitlines():
+            return
+
+        os.makedirs(info_path, exist_ok=True)
+
+        # A last line without newline would merge with ours into one bogus path
+        separator = '\n' if content and not content.endswith('\n') else ''
+
+        with open(alternates_path, 'a') as fh:
+            fh.write('{}{}\n'.format(separator, self.objects_path))
+
+
+    def run(self, argv):
+        subprocess.run(argv,
+                       stdin=subprocess.DEVNULL,
+                       stdout=subprocess.DEVNULL,
+                       stderr=subprocess.PIPE,
+                       universal_newlines=True,
+                       check=True)
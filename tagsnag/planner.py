@@ -0,0 +1,41 @@
+##
+#  planner.py
+#  tagsnag
+#
+#  Created by Thomas Johannesmeyer (thomas@geeky.gent) on 18.10.2026.
+#  Copyright (c) 2026 www.geeky.gent. All rights reserved.
+#
+
+from collections import OrderedDict
+
+
+def group_by(items, key):
+    """ Returns an OrderedDict key(item) -> [items], keys in order of first appearance """
+
+    groups = OrderedDict()
+
+    for item in items:
+        groups.setdefault(key(item), []).append(item)
+
+    return groups
+
+
+def plan_snags(snags):
+    """ Groups snags by repository, then by the tag as written in the XML.
+        Returns an OrderedDict repo name -> OrderedDict tag -> [snags]. Tags are
+        resolved per repository later, see regroup_by_resolved_tag """
+
+    return OrderedDict((repo_name, group_by(repo_snags, lambda snag: snag.tag))
+                       for repo_name, repo_snags in group_by(snags, lambda snag: snag.repo_name).items())
+
+
+def regroup_by_resolved_tag(snags_by_tag, resolve):
+    """ Resolves every tag once with resolve(tag) and merges the groups that end up
+        on the same tag. Returns an OrderedDict resolved tag -> [snags], '' for unresolved """
+
+    regrouped = OrderedDict()
+
+    for tag, snags in snags_by_tag.items():
+        regrouped.setdefault(resolve(tag), []).extend(snags)
+
+    return regrouped
@@ -0,0 +1,152 @@
+##
+#  progress.py
+#  tagsnag
+#
+#  Created by Thomas Johannesmeyer (thomas@geeky.gent) on 18.10.2026.
+#  Copyright (c) 2026 www.geeky.gent. All rights reserved.
+#
+
+import re
+import time
+import threading
+
+
+##
+# 'Receiving objects:  45% (450/1000), 1.20 MiB | 2.00 MiB/s', optionally behind 'remote: '
+progress_line = re.compile(r'(?:remote: *)?([A-Za-z ]+):\s+(\d+)% \((\d+)/(\d+)\)'
+                           r'(?:, ([\d.]+) (GiB|MiB|KiB|bytes?))?')
+
+unit_factors = {'GiB': 1 << 30, 'MiB': 1 << 20, 'KiB': 1 << 10, 'bytes': 1, 'byte': 1}
+
+RECEIVING = 'Receiving objects'
+
+# Per repo updates per second handed on to the consumer
+DEFAULT_RATE = 10
+
+
+def parse_progress_line(line):
+    """ Returns (phase, current, total, bytes or None) of a git progress line, None for other lines """
+
+    # Cheap reject before the regex, most lines without '%' are messages
+    if '%' not in line:
+        return None
+
+    match = progress_line.match(line.strip())
+
+    if not match:
+        return None
+
+    phase, percent, current, total, size, unit = match.groups()
+    received = int(float(size) * unit_factors[unit]) if size else None
+
+    return phase.strip(), int(current), int(total), received
+
+
+def format_bytes(count):
+    for unit in ['GiB', 'MiB', 'KiB']:
+        if count >= unit_factors[unit]:
+            return '{:.2f} {}'.format(count / unit_factors[unit], unit)
+
+    return '{} bytes'.format(count)
+
+
+class ProgressAggregator():
+    """ Collects git progress lines of many concurrent repos. Each repo's latest
+        state goes to callback(key, state) at most rate times per second, plus
+        once whenever a phase completes. Totals across all repos are kept for
+        summaries: objects and bytes received and the average throughput """
+
+    def __init__(self, callback=None, rate=DEFAULT_RATE):
+        self.callback = callback
+        self.interval = 1.0 / rate
+
+        self.states = {}
+        self.last_emit = {}
+        self.pending = set()
+        self.start = time.time()
+
+        self.lock = threading.Lock()
+
+
+    def feed(self, key, line):
+        """ Takes one line of git's stderr for key. Usable as AsyncGitRunner progress callback """
+
+        parsed = parse_progress_line(line)
+        now = time.time()
+
+        with self.lock:
+            state = self.states.setdefault(key, {'phase': '',
+                                                 'progress': 0.0,
+                                                 'message': '',
+                                                 'objects': 0,
+                                                 'bytes': 0})
+
+            if parsed:
+                phase, current, total, received = parsed
+                is_done = (current == total)
+
+                state['phase'] = phase
+                state['progress'] = (current / total) if total else 1.0
+                state['message'] = '{} ({}/{})'.format(phase, current, total)
+
+                if phase == RECEIVING:
+                    state['objects'] = current
+                    state['bytes'] = received or state['bytes']
+
+            elif line.strip():
+                # Errors, ref updates and 'up to date' notes
+                state['message'] = ' '.join(line.split())
+                is_done = False
+
+            else:
+                return
+
+            should_emit = is_done or (now - self.last_emit.get(key, 0) >= self.interval)
+
+            if should_emit:
+                self.last_emit[key] = now
+                self.pending.discard(key)
+                state = dict(state)
+
+            else:
+                self.pending.add(key)
+
+        if should_emit and self.callback:
+            self.callback(key, state)
+
+
+    def flush(self):
+        """ Hands on the states held back by the rate limit """
+
+        with self.lock:
+            pending = [(key, dict(self.states[key])) for key in self.pending]
+            self.pending = set()
+
+        if self.callback:
+            for key, state in pending:
+                self.callback(key, state)
+
+
+    def totals(self):
+        """ Returns {'repos', 'objects', 'bytes', 'throughput' (bytes per second)} over all repos """
+
+        with self.lock:
+            objects = sum(state['objects'] for state in self.states.values())
+            received = sum(state['bytes'] for state in self.states.values())
+            repos = len(self.states)
+
+        elapsed = max(time.time() - self.start, 1e-3)
+
+        return {'repos': repos,
+                'objects': objects,
+                'bytes': received,
+                'throughput': received / elapsed}
+
+
+    def summary(self):
+        totals = self.totals()
+
+        return '{} objects, {} from {} repos ({}/s)'.format(totals['objects'],
+                                                           format_bytes(totals['bytes']),
+                                                           totals['repos'],
+                                                           format_bytes(int(totals['throughput'])))
@@ -0,0 +1,205 @@
+##
+#  refs.py
+#  tagsnag
+#
+#  Created by Thomas Johannesmeyer (thomas@geeky.gent) on 18.10.2026.
+#  Copyright (c) 2026 www.geeky.gent. All rights reserved.
+#
+
+import os
+import re
+import bisect
+
+
+TAGS_PREFIX = 'refs/tags/'
+HEADS_PREFIX = 'refs/heads/'
+
+
+def common_dir_for(git_dir):
+    """ Returns the directory holding refs and objects. Differs from git_dir for linked worktrees """
+
+    try:
+        with open(os.path.join(git_dir, 'commondir'), 'r') as fh:
+            return os.path.normpath(os.path.join(git_dir, fh.read().strip()))
+
+    except (IOError, OSError):
+        return git_dir
+
+
+def read_head_branch(git_dir):
+    """ Returns the branch HEAD points to, None if detached or unreadable """
+
+    try:
+        with open(os.path.join(git_dir, 'HEAD'), 'r') as fh:
+            head = fh.read().strip()
+
+    except (IOError, OSError):
+        return None
+
+    if head.startswith('ref: ' + HEADS_PREFIX):
+        return head[len('ref: ' + HEADS_PREFIX):]
+
+    return None
+
+
+def natural_key(name):
+    """ Sort key treating digit runs as numbers: v1.9 < v1.10 """
+
+    # re.split with a group alternates text and digits, the types line up position by position
+    return [int(part) if i % 2 else part for i, part in enumerate(re.split(r'(\d+)', name))]
+
+
+def refs_stamp(common_dir, namespace='tags'):
+    """ Returns a value that changes whenever a ref below refs/<namespace> is added,
+        removed or moved. Git replaces ref files by renaming lock files, which
+        updates the mtime of the containing directory """
+
+    stamp = []
+
+    try:
+        stamp.append(os.stat(os.path.join(common_dir, 'packed-refs')).st_mtime_ns)
+    except OSError:
+        stamp.append(None)
+
+    for dirpath, dirnames, files in os.walk(os.path.join(common_dir, 'refs', namespace)):
+        dirnames.sort()
+        stamp.append((dirpath, os.stat(dirpath).st_mtime_ns))
+
+    return tuple(stamp)
+
+
+def read_tag_refs(common_dir):
+    """ Returns {tag name: (sha, peeled sha or None)} from packed-refs and loose refs.
+        Loose refs win over packed ones. A peeled sha of None means unknown """
+
+    tags = {}
+
+    try:
+        with open(os.path.join(common_dir, 'packed-refs'), 'r') as fh:
+            last_name = None
+
+            for line in fh:
+                line = line.rstrip('\n')
+
+                if not line or line.startswith('#'):
+                    continue
+
+                if line.startswith('^'):
+                    # Peeled value of the previous (annotated) tag
+                    if last_name:
+                        tags[last_name] = (tags[last_name][0], line[1:])
+                    continue
+
+                sha, ref = line.split(' ', 1)
+                last_name = None
+
+                if ref.startswith(TAGS_PREFIX):
+                    last_name = ref[len(TAGS_PREFIX):]
+                    tags[last_name] = (sha, None)
+
+    except (IOError, OSError):
+        pass
+
+    tags_path = os.path.join(common_dir, 'refs', 'tags')
+
+    for dirpath, dirnames, files in os.walk(tags_path):
+        for file in files:
+            if file.endswith('.lock'):
+                continue
+
+            path = os.path.join(dirpath, file)
+
+            try:
+                with open(path, 'r') as fh:
+                    sha = fh.read().strip()
+
+            except (IOError, OSError):
+                continue
+
+            name = os.path.relpath(path, tags_path).replace(os.sep, '/')
+            tags[name] = (sha, None)
+
+    return tags
+
+
+class TagIndex():
+    """ Index over a repository's tags: exact, prefix and substring lookup plus
+        peeled commit -> tags. Built from ref files only, no tag objects are loaded """
+
+    def __init__(self, commits_by_tag, stamp=None):
+        self.stamp = stamp
+        self.commits_by_tag = commits_by_tag
+        self.names = sorted(commits_by_tag)
+        self.tags_by_commit = {}
+
+        for name, commit in commits_by_tag.items():
+            self.tags_by_commit.setdefault(commit, []).append(name)
+
+        for names in self.tags_by_commit.values():
+            names.sort(key=natural_key, reverse=True)
+
+
+    @classmethod
+    def from_refs(cls, common_dir, peel):
+        """ Reads the tag refs of common_dir. peel(sha) -> commit sha, used for
+            loose and unpeeled packed refs only """
+
+        stamp = refs_stamp(common_dir)
+        commits_by_tag = {}
+
+        for name, (sha, peeled) in read_tag_refs(common_dir).items():
+            commit = peeled or peel(sha)
+
+            if commit:
+                commits_by_tag[name] = commit
+
+        return cls(commits_by_tag, stamp)
+
+
+    def exact(self, name):
+        """ Returns name if it is a tag, None otherwise """
+
+        return name if name in self.commits_by_tag else None
+
+
+    def with_prefix(self, prefix):
+        """ Returns all tags starting with prefix """
+
+        start = bisect.bisect_left(self.names, prefix)
+        end = start
+
+        while end < len(self.names) and self.names[end].startswith(prefix):
+            end += 1
+
+        return self.names[start:end]
+
+
+    def containing(self, keyword):
+        """ Returns all tags containing keyword """
+
+        return [name for name in self.names if keyword in name]
+
+
+    def find(self, keyword):
+        """ Returns the best matching tag or None. Rule: an exact match wins, then
+            tags starting with keyword, then tags containing it. Within a group the
+            highest tag in natural order wins (v1.10 beats v1.9, Release_02 beats Release_01) """
+
+        if self.exact(keyword):
+            return keyword
+
+        for candidates in (self.with_prefix(keyword), self.containing(keyword)):
+            if candidates:
+                return max(candidates, key=natural_key)
+
+        return None
+
+
+    def commit_for(self, name):
+        return self.commits_by_tag.get(name)
+
+
+    def tags_for_commit(self, commit):
+        """ Returns tags pointing to commit, highest first """
+
+        return self.tags_by_commit.get(commit, [])
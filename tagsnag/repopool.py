@@ -0,0 +1,87 @@
+##
+#  repopool.py
+#  tagsnag
+#
+#  Created by Thomas Johannesmeyer (thomas@geeky.gent) on 18.10.2026.
+#  Copyright (c) 2026 www.geeky.gent. All rights reserved.
+#
+
+import time
+import threading
+from collections import OrderedDict
+
+from git import Repo
+
+
+class RepoHandle():
+    """ A Repo opened by one thread """
+
+    def __init__(self, path):
+        self.repo = Repo(path)
+        self.thread = threading.current_thread()
+        self.last_used = time.time()
+
+
+    def is_evictable(self):
+        """ Only the owning thread (or nobody, once it ended) may close a handle """
+
+        return self.thread is threading.current_thread() or not self.thread.is_alive()
+
+
+class RepoPool():
+    """ Opens GitPython Repos lazily, one per (path, thread), so no handle is
+        shared between the Tk loop and worker threads. Handles idle for max_idle
+        seconds are closed, beyond max_open the least recently used go first """
+
+    def __init__(self, max_open=64, max_idle=60):
+        self.max_open = max_open
+        self.max_idle = max_idle
+        self.handles = OrderedDict()
+        self.lock = threading.Lock()
+
+
+    def get(self, path):
+        """ Returns the calling thread's Repo for the repository at path """
+
+        key = (path, threading.get_ident())
+
+        with self.lock:
+            handle = self.handles.pop(key, None)
+
+            # Thread idents are recycled, a handle of an ended thread is not ours
+            if handle and handle.thread is not threading.current_thread():
+                handle.repo.close()
+                handle = None
+
+            handle = handle or RepoHandle(path)
+            handle.last_used = time.time()
+            self.handles[key] = handle
+
+            self.evict()
+
+        return handle.repo
+
+
+    def evict(self):
+        """ Closes idle and surplus handles, oldest first. Has to be called with self.lock held """
+
+        now = time.time()
+
+        for key, handle in list(self.handles.items()):
+            is_idle = (now - handle.last_used > self.max_idle)
+            is_surplus = (len(self.handles) > self.max_open)
+            is_orphaned = not handle.thread.is_alive()
+
+            if (is_idle or is_surplus or is_orphaned) and handle.is_evictable():
+                del self.handles[key]
+
+                # Terminates the persistent cat-file processes and releases file handles
+                handle.repo.close()
+
+
+    def close(self):
+        with self.lock:
+            for handle in self.handles.values():
+                handle.repo.close()
+
+            self.handles.clear()
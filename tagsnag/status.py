@@ -0,0 +1,122 @@
+##
+#  status.py
+#  tagsnag
+#
+#  Created by Thomas Johannesmeyer (thomas@geeky.gent) on 18.10.2026.
+#  Copyright (c) 2026 www.geeky.gent. All rights reserved.
+#
+
+import subprocess
+
+
+##
+# Reasons for a dirty worktree
+STAGED    = 'staged'
+UNSTAGED  = 'unstaged'
+UNTRACKED = 'untracked'
+
+
+def entry_reasons(line):
+    """ Returns the reasons a `git status --porcelain=v2` line makes the worktree dirty """
+
+    kind = line[:1]
+
+    if kind == '?':
+        return {UNTRACKED}
+
+    if kind == 'u':
+        # Unmerged paths are both
+        return {STAGED, UNSTAGED}
+
+    if kind in ('1', '2'):
+        # '1 XY ...' for changes, '2 XY ...' for renames and copies. '.' means unmodified
+        reasons = set()
+
+        if line[2] != '.':
+            reasons.add(STAGED)
+
+        if line[3] != '.':
+            reasons.add(UNSTAGED)
+
+        return reasons
+
+    # Headers ('#') and ignored files ('!')
+    return set()
+
+
+def status_command(include_untracked, branch=False, config=()):
+    """ Returns the porcelain v2 status command. Rename detection is skipped, it
+        costs time and doesn't change whether the worktree is dirty """
+
+    return (['git'] + list(config) +
+            ['status', '--porcelain=v2', '--no-renames'] +
+            (['--branch'] if branch else []) +
+            ['--untracked-files={}'.format('normal' if include_untracked else 'no')])
+
+
+def read_status(root, include_untracked=True, first_only=False, branch=False, config=()):
+    """ Runs a single `git status --porcelain=v2` in root. Returns (headers, reasons):
+        the '# branch.*' headers if branch is set, and the set of reasons the worktree
+        is dirty. Reading stops as soon as the answer is known: at the first change
+        if first_only, once every possible reason showed up otherwise """
+
+    wanted = {STAGED, UNSTAGED, UNTRACKED} if include_untracked else {STAGED, UNSTAGED}
+    headers = {}
+    reasons = set()
+
+    process = subprocess.Popen(status_command(include_untracked, branch, config),
+                               cwd=root,
+                               stdin=subprocess.DEVNULL,
+                               stdout=subprocess.PIPE,
+                               stderr=subprocess.DEVNULL,
+                               universal_newlines=True)
+
+    try:
+        for line in process.stdout:
+            if line.startswith('# '):
+                # Headers precede all entries
+                key, _, value = line[2:].rstrip('\n').partition(' ')
+                headers[key] = value
+                continue
+
+            reasons |= entry_reasons(line)
+
+            if (first_only and reasons) or reasons == wanted:
+                # SIGTERM lets git remove its index.lock, if it holds one
+                process.terminate()
+                break
+
+    finally:
+        process.stdout.close()
+        process.wait()
+
+    return headers, reasons
+
+
+def read_dirty_reasons(root, include_untracked=True, first_only=False, config=()):
+    """ Returns the set of reasons the worktree in root is dirty, see read_status """
+
+    return read_status(root, include_untracked, first_only, config=config)[1]
+
+
+def parse_branch_headers(headers):
+    """ Returns (head commit, branch or None if detached, upstream or None, ahead, behind)
+        from porcelain v2 branch headers. ahead / behind are None without upstream """
+
+    head = headers.get('branch.oid')
+    branch = headers.get('branch.head')
+    upstream = headers.get('branch.upstream')
+    ahead, behind = None, None
+
+    if head == '(initial)':
+        head = None
+
+    if branch == '(detached)':
+        branch = None
+
+    if 'branch.ab' in headers:
+        # '+<ahead> -<behind>'
+        plus, minus = headers['branch.ab'].split()
+        ahead, behind = int(plus[1:]), int(minus[1:])
+
+    return head, branch, upstream, ahead, behind
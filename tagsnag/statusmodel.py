@@ -0,0 +1,183 @@
+##
+#  statusmodel.py
+#  tagsnag
+#
+#  Created by Thomas Johannesmeyer (thomas@geeky.gent) on 18.10.2026.
+#  Copyright (c) 2026 www.geeky.gent. All rights reserved.
+#
+
+from .metadata import metadata_stamp
+from .refs import natural_key
+
+import os
+import time
+import logging
+import threading
+
+
+class StatusModel():
+    """ Keeps the display state of a list of repositories current on a background
+        thread. A repo is refreshed when it was invalidated, and while it is visible
+        when its HEAD, refs or index change. Visible repos are refreshed on a slow
+        interval as well, which catches plain worktree edits. Repos scrolled out of
+        view aren't polled, they are refreshed once they come back into view.
+        Readers get the state plus a version that is bumped on every actual change """
+
+    def __init__(self, git, identities, poll_interval=0.5, refresh_interval=10):
+        self.git = git
+        self.identities = list(identities)
+        self.poll_interval = poll_interval
+        self.refresh_interval = refresh_interval
+
+        self.states = {}
+        self.versions = {}
+        self.stamps = {}
+        self.pending = set()
+
+        # All repos until the table reports what it shows, see set_visible
+        self.visible = set(self.identities)
+
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.should_stop = False
+
+        self.log = logging.getLogger('logger')
+        self.thread = threading.Thread(target=self.run, name='StatusModel', daemon=True)
+
+
+    def start(self):
+        self.thread.start()
+
+
+    def stop(self):
+        self.should_stop = True
+        self.wakeup.set()
+
+
+    def join(self):
+        """ Waits for a stopped model to finish its current refresh """
+
+        if self.thread.is_alive():
+            self.thread.join()
+
+
+    def invalidate(self, identities):
+        """ Requests a refresh of identities right away, e.g. after a checkout """
+
+        with self.lock:
+            self.pending.update(identities)
+
+        self.wakeup.set()
+
+
+    def set_visible(self, identities):
+        """ Limits polling to identities. Repos that just came into view are refreshed right away """
+
+        identities = set(identities)
+
+        with self.lock:
+            appeared = identities - self.visible
+            self.visible = identities
+            self.pending.update(appeared)
+
+        if appeared:
+            self.wakeup.set()
+
+
+    def get(self, identity):
+        """ Returns (version, state) of identity. state is None until the first refresh """
+
+        with self.lock:
+            return self.versions.get(identity, 0), self.states.get(identity)
+
+
+    def run(self):
+        last_full_refresh = 0
+
+        while not self.should_stop:
+            is_full_refresh = (time.time() - last_full_refresh >= self.refresh_interval)
+
+            if is_full_refresh:
+                last_full_refresh = time.time()
+
+            with self.lock:
+                visible = [identity for identity in self.identities if identity in self.visible]
+
+            refreshed = set()
+
+            for identity in visible:
+                if self.should_stop:
+                    return
+
+                # Invalidated repos (e.g. after an action) don't wait for the rest of the sweep
+                refreshed |= self.refresh_pending()
+
+                if identity in refreshed:
+                    continue
+
+                if is_full_refresh or self.stamp_for(identity) != self.stamps.get(identity):
+                    self.refresh(identity)
+                    refreshed.add(identity)
+
+            self.refresh_pending()
+
+            # Lookups come in bursts, close the cat-file processes nobody used for a while
+            self.git.cat_files.evict_idle()
+
+            self.wakeup.wait(self.poll_interval)
+            self.wakeup.clear()
+
+
+    def refresh_pending(self):
+        """ Refreshes the invalidated repos, visible or not. Returns them """
+
+        with self.lock:
+            pending = self.pending
+            self.pending = set()
+
+        for identity in pending:
+            if self.should_stop:
+                break
+
+            self.refresh(identity)
+
+        return pending
+
+
+    def stamp_for(self, identity):
+        """ Changes whenever HEAD, a ref or the index is written """
+
+        try:
+            index_mtime = os.stat(os.path.join(identity.git_dir, 'index')).st_mtime_ns
+        except OSError:
+            index_mtime = None
+
+        return (metadata_stamp(identity.git_dir, identity.common_dir), index_mtime)
+
+
+    def refresh(self, identity):
+        try:
+            metadata = self.git.repo_metadata(identity)
+
+            state = {'name': metadata['name'],
+                     'branch': metadata['branch'],
+                     'detached': metadata['detached'],
+                     'head_state': self.git.head_state(identity),
+                     'dirty': self.git.is_dirty(identity),
+                     'tags': sorted(metadata['tags'], key=natural_key, reverse=True),
+                     'branches': list(metadata['branches'])}
+
+        except Exception as exception:
+            # E.g. the repository is being moved or deleted. Next poll tries again
+            self.log.debug('[{}]: Status refresh failed: {}'.format(identity.name, exception))
+            return
+
+        # Taken after the refresh: the status call itself may rewrite the index
+        stamp = self.stamp_for(identity)
+
+        with self.lock:
+            self.stamps[identity] = stamp
+
+            if state != self.states.get(identity):
+                self.states[identity] = state
+                self.versions[identity] = self.versions.get(identity, 0) + 1
@@ -0,0 +1,146 @@
+##
+#  store.py
+#  tagsnag
+#
+#  Created by Thomas Johannesmeyer (thomas@geeky.gent) on 18.10.2026.
+#  Copyright (c) 2026 www.geeky.gent. All rights reserved.
+#
+
+import os
+import stat
+import hashlib
+import tempfile
+from shutil import copyfile
+from shutil import copymode
+from shutil import copyfileobj
+
+
+def file_writer(source):
+    """ Returns a write(fh) callback copying the content of the file at source """
+
+    def write(fh):
+        with open(source, 'rb') as source_fh:
+            copyfileobj(source_fh, fh, 1 << 16)
+
+    return write
+
+
+def replace_file(destination, write, mode=0o644):
+    """ Writes a new file through write(fh) and moves it to destination. An existing
+        file is replaced, never written through: after a --dedup run it is a hardlink
+        into the store, shared with the outputs of other repositories """
+
+    directory = os.path.dirname(destination)
+    os.makedirs(directory, exist_ok=True)
+
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tagsnag-')
+
+    try:
+        with os.fdopen(fd, 'wb') as fh:
+            write(fh)
+
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, destination)
+
+    finally:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+
+
+class ObjectStore():
+    """ Content-addressed store for extracted files. Every distinct content is
+        written once, keyed by its git blob id. Output paths are hardlinks into
+        the store, or copies if the store lives on another filesystem.
+
+        All hardlinks share one inode, so stored files are read-only. Outputs
+        written without the store replace the old file instead of writing
+        through it, see replace_file """
+
+    def __init__(self, path):
+        self.path = path
+
+
+    def path_for(self, sha, executable=False):
+        """ Returns the store path for blob sha """
+
+        # Hardlinks share their mode as well, so executables get their own entry
+        suffix = '.x' if executable else ''
+        return os.path.join(self.path, sha[:2], sha[2:] + suffix)
+
+
+    def add_blob(self, sha, executable, write):
+        """ Makes sure blob sha is stored. write(fh) is only called if it is not
+            stored yet. Returns the store path """
+
+        store_path = self.path_for(sha, executable)
+
+        if os.path.exists(store_path):
+            return store_path
+
+        os.makedirs(os.path.dirname(store_path), exist_ok=True)
+
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(store_path))
+
+        try:
+            with os.fdopen(fd, 'wb') as fh:
+                write(fh)
+
+            # Read-only: an edit in place would change the output of every repository linking it
+            os.chmod(tmp_path, 0o555 if executable else 0o444)
+
+            # Linking fails if a concurrent writer stored the same blob first.
+            # Keep theirs, so every output ends up on the same inode.
+            try:
+                os.link(tmp_path, store_path)
+            except FileExistsError:
+                pass
+            except OSError:
+                os.replace(tmp_path, store_path)
+
+        finally:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+
+        return store_path
+
+
+    def add_file(self, source):
+        """ Stores the content of the file at source. Returns the store path """
+
+        executable = bool(os.stat(source).st_mode & stat.S_IXUSR)
+        sha = self.blob_id_for_file(source)
+
+        return self.add_blob(sha, executable, file_writer(source))
+
+
+    def link(self, store_path, destination):
+        """ Hardlinks destination to store_path. Falls back to a copy across filesystems """
+
+        if not os.path.exists(os.path.dirname(destination)):
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+
+        if os.path.lexists(destination):
+            if os.path.exists(destination) and os.path.samefile(store_path, destination):
+                return
+
+            os.unlink(destination)
+
+        try:
+            os.link(store_path, destination)
+
+        except OSError:
+            # EXDEV across filesystems, EPERM / ENOTSUP on filesystems without hardlinks
+            copyfile(store_path, destination)
+            copymode(store_path, destination)
+
+
+    def blob_id_for_file(self, path):
+        """ Returns the git blob id of the file at path, like `git hash-object` without filters """
+
+        digest = hashlib.sha1('blob {}\0'.format(os.path.getsize(path)).encode('ascii'))
+
+        with open(path, 'rb') as fh:
+            for chunk in iter(lambda: fh.read(1 << 16), b''):
+                digest.update(chunk)
+
+        return digest.hexdigest()
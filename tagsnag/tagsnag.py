@@ -6,9 +6,12 @@
 #  Copyright (c) 2018 www.geeky.gent. All rights reserved.
 #
 
+import json
 import logging
 
 from tagsnag.git import Git
+from tagsnag.engine import THREAD_ENGINE
+from tagsnag.asyncgit import DEFAULT_CONCURRENCY
 from tagsnag.gui import GUI
 
 # Needed for CPU Count detection
@@ -17,6 +20,13 @@ import re
 class Tagsnag():
     """Tagsnag main class"""
 
+    ##
+    # Commands
+    STATUS_COMMAND = 'status'
+    SHARE_COMMAND  = 'share'
+
+    COMMANDS = [STATUS_COMMAND, SHARE_COMMAND]
+
     def __init__(self, cwd, should_use_gui = False):
         super(Tagsnag, self).__init__()
 
@@ -34,6 +44,20 @@ class Tagsnag():
         self.verbose = False
         self.should_create_logfile = False
         self.should_update = False
+        self.extraction_mode = Git.CHECKOUT_MODE
+        self.update_mode = Git.PULL_UPDATE
+        self.should_clone_partial = False
+        self.clone_depth = None
+        self.object_pool_path = None
+        self.should_use_cache = True
+        self.should_run_incremental = False
+        self.should_dedup = False
+        self.engine = THREAD_ENGINE
+        self.max_tasks_per_child = 25
+        self.fetch_jobs = DEFAULT_CONCURRENCY
+        self.max_open_files = None
+        self.discovery_depth = 1
+        self.discovery_excludes = []
         self.cpu_count = self.available_cpu_count()
 
         # Advanced setup
@@ -45,13 +69,23 @@ class Tagsnag():
 
 
 
-    def run_from_cli(self, should_update, xml_path, tag, directory, destination, filename, extension):
+    def run_from_cli(self, should_update, xml_path, tag, directory, destination, filename, extension, command=None, as_json=False):
         "This method handles run from CLI"
 
         self.git = Git(path=self.cwd, cpu_count=self.cpu_count)
+        self.configure_git(self.git)
 
-        if should_update:
-            self.git.update_all_repos()
+        try:
+            if command == Tagsnag.STATUS_COMMAND:
+                self.print_status(self.git.status_all_repos(), as_json)
+                return
+
+            if command == Tagsnag.SHARE_COMMAND:
+                self.git.share_objects_all_repos()
+                return
+
+            if should_update:
+                self.git.update_all_repos()
 
             if xml_path:
                 self.git.start_with_xml(xml_path)
@@ -71,6 +105,55 @@ class Tagsnag():
                 # Funky argument combination. Display help:
                 self.display_help()
 
+        finally:
+            # Ends the cat-file processes and repo handles
+            self.git.close()
+
+
+    def configure_git(self, git):
+        """ Hand the configured flags down to the Git instance """
+
+        git.set_should_prune(self.should_prune)
+        git.set_should_autostash(self.should_autostash)
+        git.set_extraction_mode(self.extraction_mode)
+        git.set_update_mode(self.update_mode)
+        git.set_clone_options(self.should_clone_partial, self.clone_depth)
+
+        if self.object_pool_path:
+            git.set_object_pool_path(self.object_pool_path)
+
+        git.set_should_use_cache(self.should_use_cache)
+        git.set_should_run_incremental(self.should_run_incremental)
+        git.set_should_dedup(self.should_dedup)
+        git.set_engine(self.engine, self.max_tasks_per_child)
+        git.set_fetch_jobs(self.fetch_jobs, self.max_open_files)
+        git.set_discovery(self.discovery_depth, self.discovery_excludes)
+
+
+    def print_status(self, snapshots, as_json=False):
+        """ Prints one row (or JSON line) per status snapshot """
+
+        for snapshot in snapshots:
+            if as_json:
+                print(json.dumps(snapshot, sort_keys=True))
+                continue
+
+            if snapshot['detached']:
+                head = 'Detached at {}'.format(snapshot['head'][:7])
+            else:
+                head = snapshot['branch'] or ''
+
+            if snapshot['ahead'] is None:
+                upstream = 'n/a'
+            else:
+                upstream = '+{} -{}'.format(snapshot['ahead'], snapshot['behind'])
+
+            print('{:<30} {:<24} {:<16} {:<6} {}'.format(snapshot['repo'],
+                                                         head,
+                                                         snapshot['tag'] or '',
+                                                         'dirty' if snapshot['dirty'] else 'clean',
+                                                         upstream))
+
 
     def display_help(self):
             print("{}".format('Insufficient arguments. For a full description run: tagsnag --help'))
@@ -240,6 +323,76 @@ class Tagsnag():
         self.should_autostash = flag
 
 
+    def set_extraction_mode(self, mode):
+        """ Extraction Mode Setter """
+
+        self.extraction_mode = mode
+
+
+    def set_clone_options(self, partial, depth):
+        """ Clone Options Setter """
+
+        self.should_clone_partial = partial
+        self.clone_depth = depth
+
+
+    def set_object_pool_path(self, path):
+        """ Object Pool Path Setter """
+
+        self.object_pool_path = path
+
+
+    def set_update_mode(self, mode):
+        """ Update Mode Setter """
+
+        self.update_mode = mode
+
+
+    def set_should_use_cache(self, flag):
+        """ Extraction Cache Setter """
+
+        self.should_use_cache = flag
+
+
+    def set_should_run_incremental(self, flag):
+        """ Incremental Run Setter """
+
+        self.should_run_incremental = flag
+
+
+    def set_should_dedup(self, flag):
+        """ Content-Addressed Output Setter """
+
+        self.should_dedup = flag
+
+
+    def set_engine(self, engine, max_tasks_per_child):
+        """ Execution Engine Setter """
+
+        self.engine = engine
+        self.max_tasks_per_child = max_tasks_per_child
+
+
+    def set_workers(self, count):
+        """ Worker Count Setter. Overrides the detected CPU count """
+
+        self.cpu_count = count
+
+
+    def set_fetch_jobs(self, count, max_open_files=None):
+        """ Network Concurrency Setter """
+
+        self.fetch_jobs = count
+        self.max_open_files = max_open_files
+
+
+    def set_discovery(self, depth, excludes):
+        """ Repository Discovery Setter """
+
+        self.discovery_depth = depth
+        self.discovery_excludes = excludes
+
+
     def set_create_logfile(self, flag):
         """ Create Logfile Setter """
 
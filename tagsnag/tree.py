@@ -0,0 +1,223 @@
+##
+#  tree.py
+#  tagsnag
+#
+#  Created by Thomas Johannesmeyer (thomas@geeky.gent) on 18.10.2026.
+#  Copyright (c) 2026 www.geeky.gent. All rights reserved.
+#
+
+import posixpath
+from collections import OrderedDict
+
+
+##
+# Matching rules shared by the filesystem search and the tree search. Keep
+# them in one place, otherwise both backends drift apart.
+
+def is_ignored_dir(dirpath):
+    """ Returns True if dirpath lies within (or looks like) a .git folder """
+
+    return ".git" in dirpath
+
+
+def file_matches(name, filename, extension):
+    """ Returns True if name ends with extension and contains filename """
+
+    name = name.lower()
+    extension = (extension or '').lower()
+
+    return bool(extension) and name.endswith(extension) and filename.lower() in name
+
+
+def directory_matches(dirpath, directory):
+    """ Returns True if dirpath contains the provided directory name """
+
+    return directory.lower() in dirpath.lower()
+
+
+def walk_order_key(path, is_directory=False):
+    """ Sort key putting tree paths into the order of a top-down os.walk with
+        sorted names: a directory's own files before its subdirectories """
+
+    parts = path.split('/')
+
+    if is_directory:
+        return [(1, part) for part in parts]
+
+    return [(1, part) for part in parts[:-1]] + [(0, parts[-1])]
+
+
+class TreeEntry():
+    """ Data class describing one entry of a recursive tree listing """
+
+    BLOB_TYPE = 'blob'
+    TREE_TYPE = 'tree'
+    COMMIT_TYPE = 'commit'
+
+    EXECUTABLE_MODE = '100755'
+    GITLINK_MODE    = '160000'
+
+    def __init__(self, mode, type, sha, path):
+        self.mode = mode
+        self.type = type
+        self.sha = sha
+        self.path = path
+
+    def __repr__(self):
+        return "".join([self.type, ' ', self.path])
+
+
+class Tree():
+    """ Flat, recursive listing of a commit's tree. Searches it like the
+        filesystem search would search a checked out worktree """
+
+    def __init__(self, commit, entries):
+        self.commit = commit
+        self.entries = entries
+        self.entries_by_path = None
+        self.walk_ordered = None
+
+
+    @classmethod
+    def from_objects(cls, commit, read_object):
+        """ Builds the listing by reading raw tree objects, e.g. through a
+            `git cat-file --batch` pipe. read_object(rev) -> (sha, type, data) """
+
+        root_sha, type, data = read_object('{}^{{tree}}'.format(commit))
+        sha_length = len(root_sha) // 2
+
+        entries = []
+
+        # Depth first, parents before children: the order of `ls-tree -r -t`
+        stack = [iter(cls.parse_tree_object(data, '', sha_length))]
+
+        while stack:
+            entry = next(stack[-1], None)
+
+            if entry is None:
+                stack.pop()
+                continue
+
+            entries.append(entry)
+
+            if entry.type == TreeEntry.TREE_TYPE:
+                sha, type, data = read_object(entry.sha)
+                stack.append(iter(cls.parse_tree_object(data, entry.path + '/', sha_length)))
+
+        return cls(commit, entries)
+
+
+    @staticmethod
+    def parse_tree_object(data, prefix, sha_length):
+        """ Parses a raw tree object: repeated '<mode> <name>\\0<binary sha>' """
+
+        entries = []
+        pos = 0
+
+        while pos < len(data):
+            space = data.index(b' ', pos)
+            nul = data.index(b'\0', space)
+
+            mode = data[pos:space].decode('ascii').zfill(6)
+            name = data[space + 1:nul].decode('utf-8', 'surrogateescape')
+            sha = data[nul + 1:nul + 1 + sha_length].hex()
+            pos = nul + 1 + sha_length
+
+            if mode.startswith('04'):
+                type = TreeEntry.TREE_TYPE
+            elif mode == TreeEntry.GITLINK_MODE:
+                type = TreeEntry.COMMIT_TYPE
+            else:
+                type = TreeEntry.BLOB_TYPE
+
+            entries.append(TreeEntry(mode=mode, type=type, sha=sha, path=prefix + name))
+
+        return entries
+
+
+    def walk_ordered_entries(self):
+        """ Returns the entries in the order the filesystem search visits them.
+            `ls-tree` order differs, e.g. it lists docs/readme.md before readme.md """
+
+        if self.walk_ordered is None:
+            self.walk_ordered = sorted(self.entries,
+                                       key=lambda entry: walk_order_key(entry.path,
+                                                                        entry.type == TreeEntry.TREE_TYPE))
+
+        return self.walk_ordered
+
+
+    def search_files(self, filename, extension=''):
+        """ Returns blob entries matching filename / extension """
+
+        found_entries = []
+
+        for entry in self.walk_ordered_entries():
+            if entry.type != TreeEntry.BLOB_TYPE:
+                continue
+
+            dirpath, name = posixpath.split(entry.path)
+
+            if is_ignored_dir(dirpath):
+                continue
+
+            if file_matches(name, filename, extension):
+                found_entries.append(entry)
+
+        return found_entries
+
+
+    def search_patterns(self, patterns):
+        """ Returns {(filename, extension): first matching blob entry} for many patterns
+            in a single pass over the listing. Patterns without a match are left out """
+
+        found_entries = {}
+        pending = list(OrderedDict.fromkeys(patterns))
+
+        for entry in self.walk_ordered_entries():
+            if not pending:
+                break
+
+            if entry.type != TreeEntry.BLOB_TYPE:
+                continue
+
+            dirpath, name = posixpath.split(entry.path)
+
+            if is_ignored_dir(dirpath):
+                continue
+
+            for pattern in list(pending):
+                if file_matches(name, *pattern):
+                    found_entries[pattern] = entry
+                    pending.remove(pattern)
+
+        return found_entries
+
+
+    def search_directory(self, directory):
+        """ Returns tree entries matching the directory name. Parents are
+            found before their children """
+
+        return [entry for entry in self.walk_ordered_entries()
+                if entry.type == TreeEntry.TREE_TYPE
+                and not is_ignored_dir(entry.path)
+                and directory_matches(entry.path, directory)]
+
+
+    def entry_for_path(self, path):
+        """ Returns the entry stored at path or None """
+
+        if self.entries_by_path is None:
+            self.entries_by_path = {entry.path: entry for entry in self.entries}
+
+        return self.entries_by_path.get(path)
+
+
+    def blobs_below(self, path):
+        """ Returns (relative path, entry) for every blob below path """
+
+        path = path.strip('/')
+        prefix = '' if path in ('', '.') else path + '/'
+
+        return [(entry.path[len(prefix):], entry) for entry in self.entries
+                if entry.type == TreeEntry.BLOB_TYPE and entry.path.startswith(prefix)]
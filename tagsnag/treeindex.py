@@ -0,0 +1,77 @@
+##
+#  treeindex.py
+#  tagsnag
+#
+#  Created by Thomas Johannesmeyer (thomas@geeky.gent) on 18.10.2026.
+#  Copyright (c) 2026 www.geeky.gent. All rights reserved.
+#
+
+from .tree import Tree
+from .tree import TreeEntry
+
+import os
+import json
+import tempfile
+import threading
+
+
+class TreeIndex():
+    """ Persistent path index of commit trees. A commit's tree never changes,
+        therefore an entry keyed by commit SHA never needs to be invalidated """
+
+    def __init__(self, path):
+        self.path = path
+        self.trees = {}
+        self.lock = threading.Lock()
+
+
+    def get(self, commit):
+        """ Returns the cached Tree for commit or None """
+
+        with self.lock:
+            tree = self.trees.get(commit)
+
+        if tree:
+            return tree
+
+        try:
+            with open(self.path_for_commit(commit), 'r') as fh:
+                rows = json.load(fh)
+
+        except (IOError, ValueError):
+            return None
+
+        tree = Tree(commit, [TreeEntry(mode=mode, type=type, sha=sha, path=path)
+                             for mode, type, sha, path in rows])
+
+        with self.lock:
+            self.trees[commit] = tree
+
+        return tree
+
+
+    def put(self, tree):
+        """ Stores tree in memory and on disk """
+
+        with self.lock:
+            self.trees[tree.commit] = tree
+
+        rows = [[e.mode, e.type, e.sha, e.path] for e in tree.entries]
+
+        try:
+            os.makedirs(self.path, exist_ok=True)
+
+            # Write to a temporary file first, a crashed run must not leave a truncated index behind
+            fd, tmp_path = tempfile.mkstemp(dir=self.path)
+            with os.fdopen(fd, 'w') as fh:
+                json.dump(rows, fh)
+
+            os.replace(tmp_path, self.path_for_commit(tree.commit))
+
+        except (IOError, OSError):
+            # The index is an optimization only
+            pass
+
+
+    def path_for_commit(self, commit):
+        return os.path.join(self.path, '{}.json'.format(commit))
@@ -0,0 +1,96 @@
+##
+#  test_dedup.py
+#  tagsnag
+#
+#  Created by Thomas Johannesmeyer (thomas@geeky.gent) on 18.10.2026.
+#  Copyright (c) 2026 www.geeky.gent. All rights reserved.
+#
+
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+
+from tagsnag.git import Git
+
+
+def run_git(path, *args):
+    subprocess.run(['git', '-C', path] + list(args), check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def make_repo(path, content):
+    os.makedirs(path)
+    run_git(path, 'init', '--quiet')
+    run_git(path, 'config', 'user.email', 'test@example.com')
+    run_git(path, 'config', 'user.name', 'Test')
+    commit_readme(path, content)
+
+
+def commit_readme(path, content):
+    with open(os.path.join(path, 'readme.md'), 'w') as fh:
+        fh.write(content)
+
+    run_git(path, 'add', 'readme.md')
+    run_git(path, 'commit', '--quiet', '-m', content)
+    run_git(path, 'tag', '--force', '1.0')
+
+
+class DedupOutputTest(unittest.TestCase):
+    """ Outputs linked into the store must never be written through by a later run without --dedup """
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.destination = os.path.join(self.path, 'out')
+
+        make_repo(os.path.join(self.path, 'alice'), 'root')
+        make_repo(os.path.join(self.path, 'bob'), 'root')
+
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+
+    def extract(self, mode, dedup):
+        git = Git(self.path)
+        git.set_extraction_mode(mode)
+        git.set_should_dedup(dedup)
+
+        try:
+            git.extract_file_from_all_repos(tag='1.0', filename='readme', extension='md', destination=self.destination)
+        finally:
+            git.close()
+
+        return git
+
+
+    def read(self, path):
+        with open(path, 'r') as fh:
+            return fh.read()
+
+
+    def check_store_survives_run_without_dedup(self, mode):
+        git = self.extract(mode, dedup=True)
+
+        store_path = git.object_store.path_for(git.object_store.blob_id_for_file(os.path.join(self.destination, 'alice.md')))
+        self.assertTrue(os.path.samefile(store_path, os.path.join(self.destination, 'bob.md')))
+
+        # Only bob's tag moves
+        commit_readme(os.path.join(self.path, 'bob'), 'v2')
+        self.extract(mode, dedup=False)
+
+        self.assertEqual(self.read(os.path.join(self.destination, 'bob.md')), 'v2')
+        self.assertEqual(self.read(os.path.join(self.destination, 'alice.md')), 'root')
+        self.assertEqual(self.read(store_path), 'root')
+
+
+    def test_checkout_mode(self):
+        self.check_store_survives_run_without_dedup(Git.CHECKOUT_MODE)
+
+
+    def test_tree_mode(self):
+        self.check_store_survives_run_without_dedup(Git.TREE_MODE)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+##
+#  test_tree.py
+#  tagsnag
+#
+#  Created by Thomas Johannesmeyer (thomas@geeky.gent) on 18.10.2026.
+#  Copyright (c) 2026 www.geeky.gent. All rights reserved.
+#
+
+import unittest
+
+from tagsnag.tree import Tree, TreeEntry
+
+
+def tree_from_paths(paths):
+    """ Builds a Tree in `ls-tree -r -t` order from blob paths """
+
+    entries = []
+    seen_directories = set()
+
+    for path in sorted(paths):
+        parts = path.split('/')
+
+        for depth in range(1, len(parts)):
+            directory = '/'.join(parts[:depth])
+
+            if directory not in seen_directories:
+                seen_directories.add(directory)
+                entries.append(TreeEntry('040000', TreeEntry.TREE_TYPE, '0' * 40, directory))
+
+        entries.append(TreeEntry('100644', TreeEntry.BLOB_TYPE, '0' * 40, path))
+
+    return Tree('HEAD', entries)
+
+
+class TreeSearchOrderTest(unittest.TestCase):
+    """ The tree search has to find files in the order of the filesystem search """
+
+    def setUp(self):
+        self.tree = tree_from_paths(['docs/readme.md', 'readme.md', 'src/a/readme.md'])
+
+
+    def test_search_files_prefers_root_file(self):
+        found = [entry.path for entry in self.tree.search_files('readme', 'md')]
+
+        self.assertEqual(found, ['readme.md', 'docs/readme.md', 'src/a/readme.md'])
+
+
+    def test_search_patterns_prefers_root_file(self):
+        found = self.tree.search_patterns([('readme', 'md')])
+
+        self.assertEqual(found[('readme', 'md')].path, 'readme.md')
+
+
+    def test_search_directory_finds_parents_first(self):
+        found = [entry.path for entry in self.tree.search_directory('src')]
+
+        self.assertEqual(found, ['src', 'src/a'])
+
+
+if __name__ == '__main__':
+    unittest.main()